@@ -2,9 +2,11 @@ import cv2
 import time
 import config
 from src.camera import CameraFeed
-from src.detector import ObjectDetector
+from src.detector import create_detector
 from src.reasoner import SceneReasoner
 from src.audio import AudioFeedback
+from src.scheduler import DetectionScheduler
+from src.tracker import ObjectTracker
 import threading
 import logging
 import time
@@ -21,7 +23,13 @@ def main():
         # 1. Start Camera Immediately
         camera = CameraFeed().start()
         audio = AudioFeedback()
-        reasoner = SceneReasoner()
+
+        def announce(message):
+            # Called from the LLM thread when guidance is complete; speech was streamed already
+            print(f"Speaking: {message}")
+
+        # Each sentence goes to speech as soon as the LLM produces it
+        reasoner = SceneReasoner(on_response=announce, on_sentence=audio.speak_sentence)
         
         # 2. Init Detector in Background
         detector = None
@@ -31,7 +39,7 @@ def main():
             nonlocal detector, detector_loading
             try:
                 print("Loading Object Detector (Background)...")
-                detector = ObjectDetector()
+                detector = create_detector() # In-process or worker process (config.DETECTOR_WORKER)
                 detector_loading = False
                 print("Object Detector Loaded.")
                 audio.speak("System Ready")
@@ -47,12 +55,30 @@ def main():
         cv2.namedWindow("Assistive Vision Feed", cv2.WINDOW_NORMAL)
 
         frame_count = 0
+        scheduler = DetectionScheduler() # Motion-gated detection cadence
+        tracker = ObjectTracker() # Track ids + box prediction between detections
+        last_seq = 0 # Sequence number of the last camera frame we rendered
+        detect_due = False # Scheduler asked for a detection the detector couldn't take yet
         last_speech = ""
         current_detections = [] # Persistent storage for rendering
+        show_overlays = config.LOCAL_OVERLAYS # Toggle with 'o'
 
         while True:
             try:
-                frame = camera.read()
+                # Block briefly for the next new frame instead of re-rendering the same one
+                ref = camera.wait_for_frame(last_seq, timeout=0.1, consumer="main")
+                if ref is None and last_seq:
+                    # Camera is just slower than us; keep the window responsive
+                    if cv2.waitKey(1) & 0xFF == ord("q"):
+                        break
+                    continue
+
+                frame = None
+                if ref is not None:
+                    with ref:
+                        last_seq = ref.seq
+                        frame_time = ref.timestamp
+                        frame = ref.frame.copy() # Writable copy, we draw on it
                 
                 # If no frame, create a black one with status text
                 if frame is None:
@@ -67,17 +93,28 @@ def main():
                     if detector_loading:
                         cv2.putText(frame, "Loading Model...", (20, 50), cv2.LINE_AA, 1.0, (0, 0, 255), 2)
                     
-                    elif frame_count % config.DETECTION_INTERVAL == 0:
-                         detections = detector.detect(frame)
-                         current_detections = detections # Update persistent list
-                         
-                         message = reasoner.process(detections)
-                         if message:
-                            print(f"Speaking: {message}")
-                            audio.speak(message)
+                    else:
+                        # The motion check sees every frame; a detection that comes due while the
+                        # worker is busy (or restarting) goes out with the next frame it accepts
+                        detect_due = scheduler.should_detect(frame) or detect_due
+                        # With a worker process this only hands the frame over; the UI keeps rendering
+                        if detect_due and not detector.busy and detector.submit(frame, frame_time):
+                            detect_due = False
+
+                        result = detector.poll()
+                        if result:
+                            detections, detected_at, _ = result
+                            detections = tracker.update(detections, detected_at)
+                            current_detections = detections # Update persistent list
+                            scheduler.record(detections)
+
+                            reasoner.process(detections) # Guidance is spoken as it streams in
+                        else:
+                            # Skipped frame: move boxes along their tracks instead of drawing stale ones
+                            current_detections = tracker.predict(frame.shape, frame_time)
                     
-                    # Draw persistent detections on EVERY frame
-                    for d in current_detections:
+                    # Draw persistent detections on every frame (local window only; the web UI draws its own)
+                    for d in (current_detections if show_overlays else []):
                         box = d['box']
                         label = f"{d['label']} {d['confidence']:.2f}"
                         color = (0, 0, 255) if d['is_dangerous'] else (0, 255, 0)
@@ -90,6 +127,8 @@ def main():
                 key = cv2.waitKey(1) & 0xFF
                 if key == ord("q"):
                     break
+                if key == ord("o"):
+                    show_overlays = not show_overlays
                 
                 frame_count += 1
             
@@ -114,6 +153,8 @@ def main():
             # audio.speak("Session finished.") # Optional
             
         if 'camera' in locals(): camera.stop()
+        if 'detector' in locals() and detector: detector.close()
+        if 'reasoner' in locals(): reasoner.stop()
         if 'audio' in locals(): audio.stop()
         cv2.destroyAllWindows()
 
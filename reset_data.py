@@ -14,9 +14,11 @@ def reset_data():
     CHROMA_DB_PATH = "./chroma_db"
     COLLECTION_NAME = "vision_events" # Matching vector_store.py
     LOG_FILE_PATH = "detections.jsonl"
+    VECTOR_INDEX_PATH = "./vector_index" # NumPy index (VECTOR_BACKEND = "numpy"/"auto")
     
     print("⚠️  WARNING: This will PERMANENTLY DELETE:")
     print(f"  - All records in ChromaDB collection '{COLLECTION_NAME}'")
+    print(f"  - {VECTOR_INDEX_PATH} (NumPy vector index, if present)")
     print(f"  - {LOG_FILE_PATH} (Detection Logs)")
     print("\nEnsure the 'assistive_vision_system' app is STOPPED before proceeding.")
     print("Waiting 3 seconds... (Ctrl+C to Cancel)")
@@ -60,6 +62,14 @@ def reset_data():
     else:
          print(f"ℹ️  ChromaDB directory not found at {CHROMA_DB_PATH}")
 
+    # 1b. Remove the NumPy vector index (plain files, no DB to connect to)
+    if os.path.exists(VECTOR_INDEX_PATH):
+        try:
+            shutil.rmtree(VECTOR_INDEX_PATH)
+            print(f"✅ Deleted NumPy vector index at {VECTOR_INDEX_PATH}")
+        except Exception as e:
+            print(f"❌ Failed to delete {VECTOR_INDEX_PATH}: {e}")
+
     # 2. Delete Log File (Existing logic, seemingly preserved)
     if os.path.exists(LOG_FILE_PATH):
         try:
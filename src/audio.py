@@ -13,12 +13,16 @@ class AudioFeedback:
         t.daemon = True
         t.start()
 
-    def speak(self, text):
+    def speak(self, text, max_backlog=2):
         # We assume if new text comes, it's relevant.
         # Check if queue already has similar item?
-        if self.q.qsize() < 2: # Don't build up a huge backlog
+        if self.q.qsize() < max_backlog: # Don't build up a huge backlog
             self.q.put(text)
 
+    def speak_sentence(self, text):
+        """One sentence of a streamed answer; the rest of the answer follows, so allow a longer queue."""
+        self.speak(text, max_backlog=6)
+
     def worker(self):
         print("Audio Worker Started (PowerShell TTS)")
         while not self.stopped:
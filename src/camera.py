@@ -2,24 +2,30 @@ import cv2
 import threading
 import time
 import config
+from src.frame_bus import FrameBus
+from src.replay import open_source
 
 class CameraFeed:
     def __init__(self, src=config.CAMERA_ID):
         print(f"Connecting to camera: {src} ...")
-        self.stream = cv2.VideoCapture(src)
+        # Live camera, or a replayed video / image directory / synthetic scene
+        self.stream = open_source(src)
         if not self.stream.isOpened():
             print("ERROR: Could not open camera source.")
         else:
             print("Camera source opened successfully.")
-            
+
         self.stream.set(cv2.CAP_PROP_FRAME_WIDTH, config.FRAME_WIDTH)
         self.stream.set(cv2.CAP_PROP_FRAME_HEIGHT, config.FRAME_HEIGHT)
-        (self.grabbed, self.frame) = self.stream.read()
+
+        # Frames are captured straight into preallocated slots and shared read-only
+        self.bus = FrameBus((config.FRAME_HEIGHT, config.FRAME_WIDTH, 3))
+        self.grabbed = self.bus.capture(self.stream.read, self._frame_time) is not None
         if not self.grabbed:
             print("WARNING: Initial frame read failed.")
-        
+
+        self.last_read_seq = 0
         self.stopped = False
-        self.lock = threading.Lock()
 
     def start(self):
         t = threading.Thread(target=self.update, args=())
@@ -31,16 +37,56 @@ class CameraFeed:
         while True:
             if self.stopped:
                 return
-            
-            (grabbed, frame) = self.stream.read()
-            with self.lock:
-                self.grabbed = grabbed
-                self.frame = frame
-            time.sleep(0.01) # Small sleep to prevent tight loop burning CPU
+
+            if getattr(self.stream, "consumer_paced", False):
+                # Replay at "max" speed: decode the next frame only once readers took the last one,
+                # so every consumer sees every frame regardless of thread timing
+                if not self.bus.wait_consumed(self.bus.seq, timeout=0.5):
+                    continue
+
+            # stream.read() blocks until the device has a frame, so no sleep is needed
+            self.grabbed = self.bus.capture(self.stream.read, self._frame_time) is not None
+            if not self.grabbed:
+                time.sleep(0.01) # Failed reads return immediately; don't spin on a dead source
+
+    def _frame_time(self):
+        # Replay sources report their own presentation time; live cameras use arrival time
+        return getattr(self.stream, "timestamp", None)
+
+    def acquire(self):
+        """
+        Returns a read-only FrameRef on the latest frame (or None).
+        Release it (or use `with`) as soon as you are done so the slot can be reused.
+        """
+        return self.bus.acquire()
+
+    def wait_for_frame(self, after_seq=0, timeout=None, consumer=None):
+        """
+        Blocks until a frame newer than `after_seq` arrives and returns a read-only FrameRef,
+        or None on timeout. Consumers keep `ref.seq` and pass it back on the next call.
+        """
+        return self.bus.wait(after_seq, timeout, consumer)
+
+    async def wait_for_frame_async(self, after_seq=0, timeout=None, consumer=None):
+        """Same as wait_for_frame() for asyncio code."""
+        return await self.bus.wait_async(after_seq, timeout, consumer)
+
+    def leave(self, consumer):
+        """Call when a wait_for_frame() consumer stops reading, so max-speed replay doesn't wait on it."""
+        self.bus.leave(consumer)
 
     def read(self):
-        with self.lock:
-            return self.frame.copy() if self.frame is not None else None
+        """Returns a private, writable copy of the latest frame, for callers that draw on it."""
+        ref = self.bus.acquire("read", self.last_read_seq)
+        if ref is None:
+            return None
+        with ref:
+            self.last_read_seq = ref.seq
+            return ref.frame.copy()
+
+    def stats(self):
+        """Frame counters: latest seq, producer overruns, per-consumer dropped/duplicate frames."""
+        return self.bus.stats()
 
     def stop(self):
         self.stopped = True
@@ -1,23 +1,256 @@
+import os
+import glob
+import gzip
 import json
+import shutil
+import atexit
+import logging
 import datetime
 import time
 import threading
+from collections import deque
+import config
+
+def format_log_entry(data):
+    """One-line summary of a logged event, as shown in the web UI."""
+    timestamp = str(data.get("timestamp", "")).split("T")[-1].split(".")[0] # Extract HH:MM:SS
+    label = data.get("label", "unknown")
+    conf = (data.get("metadata") or {}).get("confidence", 0)
+    return f"[{timestamp}] Detected {label} ({conf:.2f})"
+
+def read_last_lines(filepath, n, block=8192):
+    """Last n lines of a file, reading backwards from the end instead of the whole file."""
+    with open(filepath, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    return [l.decode("utf-8", errors="replace") for l in data.splitlines()[-n:] if l.strip()]
+
+class RecentLogBuffer:
+    """
+    The last `maxlen` formatted log entries, kept in memory for the status API.
+    `version` changes whenever an entry is added, so readers can skip rebuilding.
+    """
+    def __init__(self, maxlen=config.LOG_RECENT_SIZE):
+        self.entries = deque(maxlen=maxlen)
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def seed_from_file(self, filepath):
+        """Fills the buffer from the end of an existing log (cold start)."""
+        try:
+            lines = read_last_lines(filepath, self.entries.maxlen)
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                self.append(json.loads(line))
+            except (json.JSONDecodeError, TypeError, ValueError, AttributeError):
+                continue
+
+    def append(self, event_data):
+        entry = format_log_entry(event_data)
+        with self.lock:
+            self.entries.append(entry)
+            self.version += 1
+
+    def snapshot(self, n=None):
+        """(version, newest n entries, oldest first)."""
+        with self.lock:
+            entries = list(self.entries)
+            return self.version, entries[-n:] if n else entries
 
 class DataLogger:
-    def __init__(self, filepath="detections.jsonl"):
+    """
+    JSONL event log. log() only serializes into an in-memory buffer; a background thread
+    appends the buffer to a file it keeps open, once `buffer_lines` events are waiting or
+    every `flush_interval` seconds.
+
+    fsync: "none" (leave it to the OS), "flush" (after every background write) or
+           "always" (write + fsync inside log(), for when losing an event is not acceptable).
+    Every write takes the buffer and appends it under file_lock, so lines stay in log() order.
+    Rotation: when the file passes `rotate_bytes` or is older than `rotate_interval` seconds it
+    is renamed to <name>.<YYYYmmdd-HHMMSS>.jsonl (gzipped if `compress`); `keep` are kept.
+    """
+    def __init__(self, filepath="detections.jsonl", flush_interval=config.LOG_FLUSH_INTERVAL,
+                 buffer_lines=config.LOG_BUFFER_LINES, fsync=config.LOG_FSYNC,
+                 rotate_bytes=config.LOG_ROTATE_BYTES, rotate_interval=config.LOG_ROTATE_INTERVAL,
+                 compress=config.LOG_ROTATE_COMPRESS, keep=config.LOG_ROTATE_KEEP):
         self.filepath = filepath
-        self.lock = threading.Lock()
+        self.flush_interval = flush_interval
+        self.buffer_lines = buffer_lines
+        self.fsync = fsync
+        self.rotate_bytes = rotate_bytes
+        self.rotate_interval = rotate_interval
+        self.compress = compress
+        self.keep = keep
+
+        self.lock = threading.Condition() # Guards the buffer
+        self.file_lock = threading.Lock() # Guards the file handle
+        self.buffer = []
+        self.file = None
+        self.opened_at = 0.0
+        self.stopped = False
+        self.written = 0
+        self.rotations = 0
+        # Formatted tail for the UI, updated on log() rather than on flush
+        self.recent = RecentLogBuffer()
+        self.recent.seed_from_file(filepath)
+
+        self.thread = threading.Thread(target=self.worker, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
 
     def log(self, event_data: dict):
         """
-        Thread-safe appending of event data to JSONL file.
+        Thread-safe, non-blocking append of an event (written by the background thread).
         """
         # Ensure timestamp exists
         if "timestamp" not in event_data:
             # Use local time with timezone information
             event_data["timestamp"] = datetime.datetime.now().astimezone().isoformat(timespec='seconds')
 
+        json_line = json.dumps(event_data) + "\n"
+        self.recent.append(event_data)
+
+        with self.lock:
+            self.buffer.append(json_line)
+            stopped = self.stopped
+            if len(self.buffer) >= self.buffer_lines:
+                self.lock.notify()
+        if stopped:
+            # After close() nothing drains the buffer any more; write it out now
+            self._drain(close_after=True)
+        elif self.fsync == "always":
+            self._drain()
+
+    def worker(self):
+        while True:
+            with self.lock:
+                if not self.stopped and len(self.buffer) < self.buffer_lines:
+                    self.lock.wait(self.flush_interval)
+                stopped = self.stopped
+            try:
+                self._drain()
+            except Exception:
+                pass # Logged by _drain; keep the worker running
+            if stopped:
+                return
+
+    def _drain(self, close_after=False):
+        """
+        Takes the buffer and writes it in one file_lock section, so batches reach the file
+        in the order they were logged whichever thread drains them.
+        """
+        with self.file_lock:
+            with self.lock:
+                lines, self.buffer = self.buffer, []
+            try:
+                if lines:
+                    self._write_locked(lines)
+            except Exception as e:
+                logging.error(f"DataLogger write failed, {len(lines)} events lost: {e}")
+                raise
+            finally:
+                if close_after and self.file:
+                    self.file.close()
+                    self.file = None
+
+    def _open(self):
+        if self.file is None:
+            self.file = open(self.filepath, "a", encoding="utf-8")
+            # An existing file counts from when it was last written, for time-based rotation
+            self.opened_at = os.path.getmtime(self.filepath) if self.file.tell() else time.time()
+
+    def _write_locked(self, lines):
+        """Appends lines to the log (called with file_lock held)."""
+        self._open()
+        if self._should_rotate():
+            self._rotate()
+            self._open()
+        self.file.writelines(lines)
+        self.file.flush()
+        if self.fsync in ("flush", "always"):
+            os.fsync(self.file.fileno())
+        self.written += len(lines)
+
+    def _should_rotate(self):
+        size = self.file.tell()
+        if self.rotate_bytes and size >= self.rotate_bytes:
+            return True
+        return bool(self.rotate_interval and size and time.time() - self.opened_at >= self.rotate_interval)
+
+    def _rotate(self):
+        """Moves the current file aside (called with file_lock held)."""
+        self.file.close() # Windows can't rename an open file
+        self.file = None
+        base, ext = os.path.splitext(self.filepath)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        target, n = f"{base}.{stamp}{ext}", 1
+        while os.path.exists(target) or os.path.exists(target + ".gz"):
+            target, n = f"{base}.{stamp}-{n}{ext}", n + 1
+        os.replace(self.filepath, target)
+        if self.compress:
+            with open(target, "rb") as src, gzip.open(target + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(target)
+        self.rotations += 1
+        # Drop the oldest rotated files beyond `keep`
+        rotated = sorted(glob.glob(f"{glob.escape(base)}.*-*{ext}*"))
+        for old in rotated[:-self.keep] if self.keep else []:
+            try:
+                os.remove(old)
+            except OSError as e:
+                logging.warning(f"Could not remove old log {old}: {e}")
+
+    def flush(self):
+        """Writes everything logged so far (synchronously)."""
+        self._drain()
+
+    def close(self):
+        """
+        Drains the buffer and closes the file. Safe to call more than once; events logged
+        afterwards are written straight to the file.
+        """
         with self.lock:
-            with open(self.filepath, "a", encoding="utf-8") as f:
-                json_line = json.dumps(event_data)
-                f.write(json_line + "\n")
+            if self.stopped:
+                return
+            self.stopped = True
+            self.lock.notify()
+        self.thread.join(timeout=5.0)
+        self._drain(close_after=True)
+
+    def prune(self, cutoff):
+        """
+        Rewrites the log without events older than `cutoff` (epoch seconds).
+        Returns the number of lines removed.
+        """
+        self.flush()
+        with self.file_lock:
+            if not os.path.exists(self.filepath):
+                return 0
+            if self.file:
+                self.file.close() # Reopened on the next write
+                self.file = None
+            kept, removed = [], 0
+            with open(self.filepath, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        ts = datetime.datetime.fromisoformat(json.loads(line)["timestamp"]).timestamp()
+                    except (ValueError, KeyError, TypeError):
+                        ts = None # Keep lines we can't date
+                    if ts is not None and ts < cutoff:
+                        removed += 1
+                    else:
+                        kept.append(line)
+            if removed:
+                tmp = self.filepath + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.writelines(kept)
+                os.replace(tmp, self.filepath)
+            return removed
@@ -0,0 +1,130 @@
+import json
+import numpy as np
+import config
+
+POSITIONS = ("left", "center", "right")
+DISTANCES = ("far", "medium", "near")  # Index order == closeness (same as the reasoner's dist_map)
+
+
+def label_table(names):
+    """Turns a model's {class_id: name} mapping into an index-able object array."""
+    size = max(names) + 1 if names else 0
+    table = np.empty(size, dtype=object)
+    for cls, name in names.items():
+        table[cls] = name
+    return table
+
+
+def danger_table(labels):
+    """Boolean mask over class ids, True for classes in config.DANGEROUS_OBJECTS."""
+    return np.array([str(name).lower() in config.DANGEROUS_OBJECTS for name in labels], dtype=bool)
+
+
+class DetectionBatch:
+    """
+    All detections for one frame, stored column-wise as NumPy arrays.
+
+    Existing callers can keep treating it as a list of dicts in the enhanced schema
+    (iteration, indexing, len, truthiness); the dicts are only built on first access.
+    Use to_list() where a real list is needed (e.g. JSON responses).
+    """
+    __slots__ = ("boxes", "class_ids", "confidences", "positions", "distances", "dangerous",
+                 "labels", "track_ids", "approaching", "_dicts")
+
+    def __init__(self, boxes, class_ids, confidences, positions, distances, dangerous, labels):
+        self.boxes = boxes              # (N, 4) float32 xyxy in frame pixels
+        self.class_ids = class_ids      # (N,) int
+        self.confidences = confidences  # (N,) float32
+        self.positions = positions      # (N,) index into POSITIONS
+        self.distances = distances      # (N,) index into DISTANCES
+        self.dangerous = dangerous      # (N,) bool
+        self.labels = labels            # Model label table, indexed by class id
+        self.track_ids = None           # (N,) int, set by the tracker
+        self.approaching = None         # (N,) bool, set by the tracker
+        self._dicts = None
+
+    @classmethod
+    def empty(cls, labels=()):
+        return cls(np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.intp),
+                   np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.intp),
+                   np.zeros(0, dtype=np.intp), np.zeros(0, dtype=bool), labels)
+
+    @classmethod
+    def from_arrays(cls, boxes, class_ids, confidences, frame_shape, labels, danger_mask):
+        """Derives position, distance bucket and danger flag for every box in one pass."""
+        height, width = frame_shape[:2]
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        class_ids = np.asarray(class_ids).astype(np.intp, copy=False)
+        confidences = np.asarray(confidences, dtype=np.float32)
+
+        x1, y1, x2, y2 = boxes.T
+
+        # Position: center of box relative to frame width
+        cx = (x1 + x2) / 2
+        positions = np.ones(len(boxes), dtype=np.intp)
+        positions[cx < width * 0.33] = 0
+        positions[cx > width * 0.66] = 2
+
+        # Distance: bbox area relative to frame area
+        ratio = (x2 - x1) * (y2 - y1) / float(width * height)
+        distances = np.zeros(len(boxes), dtype=np.intp)
+        distances[ratio >= config.AREA_MEDIUM] = 1
+        distances[ratio >= config.AREA_NEAR] = 2
+
+        dangerous = danger_mask[class_ids] if len(class_ids) else np.zeros(0, dtype=bool)
+        return cls(boxes, class_ids, confidences, positions, distances, dangerous, labels)
+
+    def set_tracks(self, track_ids, approaching):
+        """Attaches tracker output; adds 'track_id' and 'approaching' to the dict view."""
+        self.track_ids = track_ids
+        self.approaching = approaching
+        self._dicts = None
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def __bool__(self):
+        return len(self.class_ids) > 0
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __getitem__(self, index):
+        return self.to_list()[index]
+
+    def to_list(self):
+        """
+        Legacy schema, built once and cached. Treat the dicts as read-only; they are shared.
+        {label, confidence, distance, position, is_dangerous, box[, track_id, approaching]}
+        """
+        if self._dicts is None:
+            self._dicts = [
+                {
+                    'label': self.labels[cls],
+                    'confidence': conf,
+                    'distance': DISTANCES[dist],
+                    'position': POSITIONS[pos],
+                    'is_dangerous': danger,
+                    'box': box
+                }
+                for cls, conf, dist, pos, danger, box in zip(
+                    self.class_ids.tolist(), self.confidences.tolist(), self.distances.tolist(),
+                    self.positions.tolist(), self.dangerous.tolist(), self.boxes.tolist())
+            ]
+            if self.track_ids is not None:
+                for d, track_id, approaching in zip(self._dicts, self.track_ids.tolist(), self.approaching.tolist()):
+                    d['track_id'] = track_id
+                    d['approaching'] = approaching
+        return self._dicts
+
+    def to_boxes(self):
+        """Compact rows for client-side overlays: [x1, y1, x2, y2, label, confidence, is_dangerous]."""
+        return [
+            box + [self.labels[cls], round(conf, 2), danger]
+            for box, cls, conf, danger in zip(
+                np.rint(self.boxes).astype(int).tolist(), self.class_ids.tolist(),
+                self.confidences.tolist(), self.dangerous.tolist())
+        ]
+
+    def to_json(self):
+        return json.dumps(self.to_list())
@@ -1,14 +1,29 @@
-from ultralytics import YOLO
 import config
+from src.detections import DetectionBatch, label_table, danger_table
+from src.inference import create_backend
+
+def create_detector():
+    """In-process ObjectDetector, or a DetectorProcess when config.DETECTOR_WORKER is set."""
+    if config.DETECTOR_WORKER:
+        from src.detector_worker import DetectorProcess
+        return DetectorProcess()
+    return ObjectDetector()
 
 class ObjectDetector:
-    def __init__(self, model_path=config.MODEL_PATH):
-        self.model = YOLO(model_path)
-    
+    busy = False # submit() finishes synchronously
+
+    def __init__(self, model_path=config.MODEL_PATH, backend=config.INFERENCE_BACKEND):
+        # PyTorch by default; ONNX Runtime / OpenVINO run a cached export on CPU
+        self.backend = create_backend(backend, model_path)
+        self.pending = None
+        # Per-class lookups so post-processing never touches label strings per box
+        self.labels = label_table(self.backend.names)
+        self.danger_mask = danger_table(self.labels)
+
     def detect(self, frame):
         """
         Detects objects in the frame.
-        Returns a list of dictionaries in the enhanced schema:
+        Returns a DetectionBatch; iterating it yields dictionaries in the enhanced schema:
         {
           "label": "<string>",
           "confidence": <float>,
@@ -18,54 +33,21 @@ class ObjectDetector:
           "box": [x1, y1, x2, y2] (kept for visualization)
         }
         """
-        height, width, _ = frame.shape
-        frame_area = width * height
-        
-        # stream=True for efficiency
-        results = self.model.predict(frame, conf=config.CONFIDENCE_THRESHOLD, verbose=False)
-        
-        detections = []
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                # bounding box
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                
-                # Metadata Extraction
-                # 1. Label & Conf
-                cls = int(box.cls[0].item())
-                label = self.model.names[cls]
-                conf = box.conf[0].item()
-                
-                # 2. Position (Center of box relative to frame width)
-                cx = (x1 + x2) / 2
-                if cx < width * 0.33:
-                    position = "left"
-                elif cx > width * 0.66:
-                    position = "right"
-                else:
-                    position = "center"
-                
-                # 3. Distance (Based on Area coverage)
-                obj_area = (x2 - x1) * (y2 - y1)
-                ratio = obj_area / frame_area
-                
-                if ratio >= config.AREA_NEAR:
-                    distance = "near"
-                elif ratio >= config.AREA_MEDIUM:
-                    distance = "medium"
-                else:
-                    distance = "far"
-                
-                # 4. Safety
-                is_dangerous = label.lower() in config.DANGEROUS_OBJECTS
-                
-                detections.append({
-                    'label': label,
-                    'confidence': conf,
-                    'distance': distance,
-                    'position': position,
-                    'is_dangerous': is_dangerous,
-                    'box': [x1, y1, x2, y2]
-                })
-        return detections
+        # Backends hand back NumPy arrays, so every tensor crosses over exactly once
+        boxes, class_ids, confidences = self.backend.infer(frame)
+        return DetectionBatch.from_arrays(
+            boxes, class_ids, confidences, frame.shape, self.labels, self.danger_mask
+        )
+
+    # Same submit/poll interface as DetectorProcess, so callers work with either.
+    # poll() returns (DetectionBatch, timestamp, frame) with the frame that was detected
+    def submit(self, frame, timestamp=None):
+        self.pending = (self.detect(frame), timestamp, frame)
+        return True
+
+    def poll(self, timeout=0):
+        result, self.pending = self.pending, None
+        return result
+
+    def close(self):
+        pass
@@ -0,0 +1,300 @@
+import time
+import queue
+import logging
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import config
+from src.detections import DetectionBatch, label_table, danger_table
+
+
+def _worker_main(shm_name, requests, results, model_path, backend):
+    """Runs in the child process: owns the model, reads frames from shared memory."""
+    from src.detector import ObjectDetector
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    buf = np.ndarray((shm.size,), dtype=np.uint8, buffer=shm.buf)
+    try:
+        detector = ObjectDetector(model_path, backend)
+        results.put(("ready", 0, {int(i): str(n) for i, n in enumerate(detector.labels) if n is not None}))
+    except Exception as e:
+        results.put(("error", 0, f"Failed to load detector: {e}"))
+        shm.close()
+        return
+
+    while True:
+        msg = requests.get()
+        if msg is None:
+            break
+        kind, req_id, shape = msg
+        if kind == "ping":
+            results.put(("pong", req_id, None))
+            continue
+        try:
+            frame = buf[:int(np.prod(shape))].reshape(shape)
+            batch = detector.detect(frame)
+            results.put(("result", req_id, (batch.boxes, batch.class_ids, batch.confidences)))
+        except Exception as e:
+            results.put(("error", req_id, str(e)))
+
+    del buf
+    shm.close()
+
+
+class DetectorProcess:
+    """
+    ObjectDetector running in a separate process so its GIL-heavy pre/post-processing
+    never stalls the UI loop or the web server.
+
+    Frames go through a shared memory block (one copy in, nothing pickled); results
+    come back as small NumPy arrays over a queue. A supervisor thread starts the worker,
+    pings it every DETECTOR_WORKER_PING_INTERVAL seconds and restarts it when it dies or
+    hangs. While a (re)start is in progress the detector reports busy and poll() returns
+    None, so callers keep rendering instead of waiting for the model to reload.
+    """
+    def __init__(self, model_path=config.MODEL_PATH, backend=config.INFERENCE_BACKEND,
+                 frame_shape=(config.FRAME_HEIGHT, config.FRAME_WIDTH, 3)):
+        self.model_path = model_path
+        self.backend = backend
+        self.ctx = mp.get_context("spawn")
+        self.labels = None
+        self.danger_mask = None
+        self.req_id = 0
+        self.pending = None  # (req_id, frame_shape, timestamp, sent_at)
+        self.frame = None    # Copy of the frame being detected, handed back by poll()
+        self.restarts = 0
+        self.last_latency = 0.0
+        self.process = None
+        self.shm = None
+
+        # Held for queue round-trips and while the worker is swapped; submit() never waits for it
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.wake = threading.Event()
+        self.restart_reason = None
+        self.nbytes = int(np.prod(frame_shape))
+        self.closed = False
+        self.supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self.supervisor.start()
+
+        # Callers expect a usable detector (and its labels) once this returns
+        if not self.ready.wait(config.DETECTOR_WORKER_START_TIMEOUT) or self.labels is None:
+            self.close()
+            raise RuntimeError(self.restart_reason or "Detector worker did not start in time")
+
+    def _start(self, nbytes):
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.shm_buf = np.ndarray((nbytes,), dtype=np.uint8, buffer=self.shm.buf)
+        self.requests = self.ctx.Queue()
+        self.results = self.ctx.Queue()
+        self.process = self.ctx.Process(
+            target=_worker_main,
+            args=(self.shm.name, self.requests, self.results, self.model_path, self.backend),
+            daemon=True
+        )
+        self.process.start()
+
+        deadline = time.time() + config.DETECTOR_WORKER_START_TIMEOUT
+        while True:
+            try:
+                kind, _, payload = self.results.get(timeout=1.0)
+                break
+            except queue.Empty:
+                if not self.process.is_alive():
+                    raise RuntimeError(f"Detector worker exited during start-up (code {self.process.exitcode})")
+                if self.closed or time.time() > deadline:
+                    raise RuntimeError("Detector worker did not start in time")
+        if kind != "ready":
+            raise RuntimeError(payload)
+        self.labels = label_table(payload)
+        self.danger_mask = danger_table(self.labels)
+        print(f"Detector worker started (pid {self.process.pid}).")
+
+    def _stop(self):
+        if self.process is not None:
+            try:
+                self.requests.put(None)
+                self.process.join(timeout=2)
+            except Exception:
+                pass
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout=2)
+            self.process = None
+        if self.shm is not None:
+            del self.shm_buf
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def _supervise(self):
+        """Supervisor thread: (re)starts the worker and checks on it periodically."""
+        backoff = 1.0
+        while not self.closed:
+            if not self.ready.is_set():
+                with self.lock:
+                    if self.closed:
+                        return
+                    if self.process is not None:
+                        logging.warning(f"Restarting detector worker: {self.restart_reason}")
+                        print(f"⚠️ Restarting detector worker: {self.restart_reason}")
+                        self.restarts += 1
+                    try:
+                        self._stop()
+                        self._start(self.nbytes)
+                        self.restart_reason = None
+                        backoff = 1.0
+                        self.ready.set()
+                    except Exception as e:
+                        self.restart_reason = str(e)
+                        logging.error(f"Detector worker failed to start: {e}")
+                if not self.ready.is_set():
+                    # Failed: try again later instead of on every frame
+                    self.wake.wait(backoff)
+                    self.wake.clear()
+                    backoff = min(backoff * 2, 60.0)
+                continue
+
+            self.wake.wait(config.DETECTOR_WORKER_PING_INTERVAL)
+            self.wake.clear()
+            if self.closed or not self.ready.is_set():
+                continue
+            problem = self._check_health()
+            if problem:
+                self._request_restart(problem)
+
+    def _check_health(self):
+        """Returns why the worker needs a restart, or None if it is fine."""
+        if not self.process.is_alive():
+            return "worker process died"
+        pending = self.pending
+        if pending:
+            if time.time() - pending[3] > config.DETECTOR_WORKER_TIMEOUT:
+                return "detection timed out"
+            return None
+        if not self.lock.acquire(blocking=False):
+            return None # A submit is in progress; check again next time
+        try:
+            if self.pending or not self.ready.is_set():
+                return None
+            return None if self.is_healthy(timeout=config.DETECTOR_WORKER_TIMEOUT) else "worker did not answer ping"
+        finally:
+            self.lock.release()
+
+    def _request_restart(self, reason, nbytes=None):
+        """Hands the restart to the supervisor thread; returns immediately."""
+        if nbytes:
+            self.nbytes = max(self.nbytes, nbytes)
+        self.restart_reason = reason
+        self.ready.clear()
+        self.pending = None
+        self.wake.set()
+
+    @property
+    def busy(self):
+        return self.pending is not None or not self.ready.is_set()
+
+    def is_healthy(self, timeout=1.0):
+        """Round-trips a ping. Call with self.lock held and no detection in flight."""
+        if not self.process.is_alive():
+            return False
+        self.req_id += 1
+        self.requests.put(("ping", self.req_id, None))
+        try:
+            kind, req_id, _ = self.results.get(timeout=timeout)
+            return kind == "pong" and req_id == self.req_id
+        except queue.Empty:
+            return False
+
+    def submit(self, frame, timestamp=None):
+        """
+        Hands a frame to the worker. Returns False if it is busy or restarting.
+        poll() hands back a copy of this frame with its result.
+        """
+        if self.busy or not self.lock.acquire(blocking=False):
+            return False
+        try:
+            if not self.ready.is_set() or self.pending:
+                return False
+            if not self.process.is_alive():
+                self._request_restart("worker process died")
+                return False
+            if frame.nbytes > self.shm.size:
+                self._request_restart("frame larger than shared buffer", frame.nbytes)
+                return False
+
+            self.shm_buf[:frame.nbytes] = frame.reshape(-1)
+            if self.frame is None or self.frame.shape != frame.shape:
+                self.frame = np.empty_like(frame)
+            np.copyto(self.frame, frame)
+            self.req_id += 1
+            self.pending = (self.req_id, frame.shape, timestamp, time.time())
+            self.requests.put(("detect", self.req_id, frame.shape))
+            return True
+        finally:
+            self.lock.release()
+
+    def poll(self, timeout=0):
+        """
+        Returns (DetectionBatch, timestamp, frame) once the submitted frame is done, else None.
+        `frame` is the frame that was detected; it stays valid until the next submit().
+        """
+        pending = self.pending
+        if not pending or not self.ready.is_set():
+            return None
+        req_id, shape, timestamp, sent_at = pending
+        results = self.results
+        deadline = time.time() + timeout
+        while True:
+            try:
+                remaining = deadline - time.time()
+                msg = results.get(timeout=remaining) if remaining > 0 else results.get_nowait()
+            except queue.Empty:
+                if time.time() - sent_at > config.DETECTOR_WORKER_TIMEOUT or not self.process.is_alive():
+                    self._request_restart("detection timed out" if self.process.is_alive() else "worker process died")
+                return None
+            except (OSError, ValueError):
+                return None # Queue closed by a concurrent restart
+
+            kind, msg_id, payload = msg
+            if msg_id != req_id:
+                continue # Stale pong or a result from before a restart
+            if self.pending is not pending:
+                return None # Restarted meanwhile
+            self.pending = None
+            self.last_latency = time.time() - sent_at
+            if kind == "error":
+                logging.error(f"Detector worker error: {payload}")
+                return DetectionBatch.empty(self.labels), timestamp, self.frame
+            boxes, class_ids, confidences = payload
+            batch = DetectionBatch.from_arrays(boxes, class_ids, confidences, shape, self.labels, self.danger_mask)
+            return batch, timestamp, self.frame
+
+    def detect(self, frame):
+        """Blocking call with the same contract as ObjectDetector.detect()."""
+        deadline = time.time() + config.DETECTOR_WORKER_TIMEOUT + 0.5
+        while time.time() < deadline:
+            if self.submit(frame):
+                result = self.poll(timeout=max(deadline - time.time(), 0))
+                return result[0] if result else DetectionBatch.empty(self.labels)
+            if self.pending:
+                self.poll(timeout=0.1) # Finish (and discard) an older request
+            else:
+                time.sleep(0.05) # Restarting
+        return DetectionBatch.empty(self.labels)
+
+    def stats(self):
+        return {
+            "alive": self.process is not None and self.process.is_alive(),
+            "ready": self.ready.is_set(),
+            "restarts": self.restarts,
+            "last_latency": self.last_latency
+        }
+
+    def close(self):
+        self.closed = True
+        self.ready.clear()
+        self.wake.set()
+        with self.lock:
+            self._stop()
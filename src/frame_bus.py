@@ -0,0 +1,216 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import config
+
+
+class FrameRef:
+    """
+    Read-only handle on one FrameBus slot.
+    The slot cannot be reused until release() is called (or the `with` block exits).
+    """
+    __slots__ = ("seq", "frame", "timestamp", "_bus", "_index")
+
+    def __init__(self, bus, index, seq, frame, timestamp):
+        self.seq = seq
+        self.frame = frame
+        self.timestamp = timestamp
+        self._bus = bus
+        self._index = index
+
+    def release(self):
+        if self._bus is not None:
+            self._bus._release(self._index)
+            self._bus = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class FrameBus:
+    """
+    Preallocated ring of frame slots shared between one producer and many readers.
+
+    The producer fills a free slot in place (no per-frame allocation) and publishes it
+    with a sequence number. Readers get read-only views of the newest slot; a slot is
+    only handed back to the producer once every reader holding it has released it.
+    """
+    def __init__(self, shape, slots=config.FRAME_BUS_SLOTS, dtype=np.uint8):
+        if slots < 2:
+            raise ValueError("FrameBus needs at least 2 slots")
+        self.buffers = [np.empty(shape, dtype=dtype) for _ in range(slots)]
+        self.refs = [0] * slots
+        self.seqs = [0] * slots
+        self.stamps = [0.0] * slots
+        self.latest = -1    # Index of the newest published slot
+        self.writing = -1   # Index currently being filled by the producer
+        self.seq = 0
+        self.overruns = 0   # Frames discarded because every slot was pinned by readers
+        self.consumers = {} # {name: {'frames': n, 'dropped': n, 'duplicates': n}}
+        self.last_taken = {} # {name: seq} for consumers that block in wait(), used for backpressure
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.async_waiters = [] # [(loop, future)] woken on every publish
+
+    def _claim(self):
+        with self.lock:
+            for i in range(len(self.buffers)):
+                if i != self.latest and i != self.writing and self.refs[i] == 0:
+                    self.writing = i
+                    return i
+            self.overruns += 1
+            return -1
+
+    def capture(self, read_fn, timestamp=None):
+        """
+        Fills a free slot with read_fn(buffer) -> (ok, frame) and publishes it.
+        read_fn should write into `buffer` (cv2.VideoCapture.read does when the shape matches);
+        if it returns a different array, that array becomes the slot's buffer.
+        `timestamp` may be a callable evaluated after the read (e.g. a replay clock).
+        Returns the new sequence number, or None if nothing was published.
+        """
+        index = self._claim()
+        if index < 0:
+            # Keep the source drained so we don't fall behind, but there is nowhere to put it
+            read_fn(None)
+            return None
+
+        ok, frame = read_fn(self.buffers[index])
+        if not ok or frame is None:
+            with self.lock:
+                self.writing = -1
+            return None
+
+        if frame is not self.buffers[index]:
+            self.buffers[index] = frame  # Source size differs from config; adopt its array
+
+        if callable(timestamp):
+            timestamp = timestamp()
+
+        with self.lock:
+            self.seq += 1
+            seq = self.seq
+            self.seqs[index] = seq
+            self.stamps[index] = timestamp if timestamp is not None else time.time()
+            self.latest = index
+            self.writing = -1
+            self.cond.notify_all()
+            waiters, self.async_waiters = self.async_waiters, []
+
+        for loop, fut in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, fut)
+            except RuntimeError:
+                pass # Loop already closed
+        return seq
+
+    def publish(self, frame, timestamp=None):
+        """Copies an existing array into the bus (for sources that can't fill a buffer)."""
+        def fill(buffer):
+            if buffer is None:
+                return True, frame
+            if buffer.shape != frame.shape or buffer.dtype != frame.dtype:
+                return True, frame.copy()
+            np.copyto(buffer, frame)
+            return True, buffer
+        return self.capture(fill, timestamp)
+
+    def _latest_seq(self):
+        return self.seqs[self.latest] if self.latest >= 0 else 0
+
+    def _acquire_locked(self, consumer=None, after_seq=0):
+        index = self.latest
+        seq = self.seqs[index]
+        if consumer is not None:
+            stats = self.consumers.setdefault(consumer, {'frames': 0, 'dropped': 0, 'duplicates': 0})
+            if seq <= after_seq:
+                stats['duplicates'] += 1
+            else:
+                stats['frames'] += 1
+                if after_seq:
+                    stats['dropped'] += seq - after_seq - 1
+        self.refs[index] += 1
+        view = self.buffers[index].view()
+        view.flags.writeable = False
+        return FrameRef(self, index, seq, view, self.stamps[index])
+
+    def acquire(self, consumer=None, after_seq=0):
+        """
+        Returns a FrameRef on the newest frame, or None if nothing has been published.
+        Pass `consumer` and the last seq it saw to have drops/duplicates counted.
+        """
+        with self.lock:
+            if self.latest < 0:
+                return None
+            return self._acquire_locked(consumer, after_seq)
+
+    def wait(self, after_seq=0, timeout=None, consumer=None):
+        """Blocks until a frame newer than `after_seq` is published. Returns a FrameRef or None on timeout."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self._latest_seq() > after_seq, timeout):
+                return None
+            return self._taken(self._acquire_locked(consumer, after_seq), consumer)
+
+    async def wait_async(self, after_seq=0, timeout=None, consumer=None):
+        """asyncio equivalent of wait(); never blocks the event loop."""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            with self.lock:
+                if self._latest_seq() > after_seq:
+                    return self._taken(self._acquire_locked(consumer, after_seq), consumer)
+                fut = loop.create_future()
+                self.async_waiters.append((loop, fut))
+
+            remaining = None if deadline is None else deadline - loop.time()
+            try:
+                await asyncio.wait_for(fut, remaining)
+            except asyncio.TimeoutError:
+                with self.lock:
+                    if (loop, fut) in self.async_waiters:
+                        self.async_waiters.remove((loop, fut))
+                return None
+
+    def _taken(self, ref, consumer):
+        # Called with the lock held
+        if consumer is not None:
+            self.last_taken[consumer] = ref.seq
+            self.cond.notify_all() # A producer may be waiting in wait_consumed()
+        return ref
+
+    def wait_consumed(self, seq, timeout=None):
+        """
+        Blocks until every consumer waiting through wait()/wait_async() has taken frame `seq`
+        (and at least one has). Lets a source that can run faster than real time be paced
+        by its readers instead of dropping frames. Returns False on timeout.
+        """
+        with self.cond:
+            return self.cond.wait_for(
+                lambda: self.last_taken and min(self.last_taken.values()) >= seq, timeout)
+
+    def leave(self, consumer):
+        """Stops counting `consumer` for wait_consumed() (it stopped reading frames)."""
+        with self.cond:
+            self.last_taken.pop(consumer, None)
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'seq': self._latest_seq(),
+                'overruns': self.overruns,
+                'consumers': {k: dict(v) for k, v in self.consumers.items()}
+            }
+
+    def _release(self, index):
+        with self.lock:
+            self.refs[index] -= 1
+
+
+def _wake(fut):
+    if not fut.done():
+        fut.set_result(None)
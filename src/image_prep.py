@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+import config
+
+
+class ImagePreparer:
+    """
+    Turns a BGR camera frame into a small JPEG for multimodal LLM calls.
+
+    Optionally crops to the area around the detections, downsizes so the long side is
+    at most `max_side`, then encodes straight from BGR (no RGB/PIL round trip). Quality
+    adapts between calls to stay under `max_bytes` without re-encoding every time.
+    The resize buffer is reused across calls.
+    """
+    MIN_QUALITY = 30
+    QUALITY_STEP = 10
+
+    def __init__(self, max_side=config.LLM_IMAGE_MAX_SIDE, quality=config.LLM_IMAGE_QUALITY,
+                 max_bytes=config.LLM_IMAGE_MAX_BYTES, crop=config.LLM_IMAGE_CROP):
+        self.max_side = max_side
+        self.max_quality = quality
+        self.quality = quality  # Carried over between calls
+        self.max_bytes = max_bytes
+        self.crop = crop
+        self.resized = None
+        self.last_size = 0
+
+    def _crop(self, frame, objects, margin=0.15):
+        boxes = np.array([o['box'] for o in objects if o.get('box')], dtype=np.float32).reshape(-1, 4)
+        if not len(boxes):
+            return frame
+        h, w = frame.shape[:2]
+        x1, y1 = boxes[:, 0].min(), boxes[:, 1].min()
+        x2, y2 = boxes[:, 2].max(), boxes[:, 3].max()
+        mx, my = (x2 - x1) * margin, (y2 - y1) * margin
+        x1, y1 = int(max(0, x1 - mx)), int(max(0, y1 - my))
+        x2, y2 = int(min(w, x2 + mx)), int(min(h, y2 + my))
+        if x2 - x1 < 32 or y2 - y1 < 32:
+            return frame
+        return frame[y1:y2, x1:x2]
+
+    def _resize(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.max_side / max(h, w)
+        if scale >= 1:
+            return frame
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        if self.resized is None or self.resized.shape[:2] != (size[1], size[0]):
+            self.resized = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        cv2.resize(frame, size, dst=self.resized, interpolation=cv2.INTER_AREA)
+        return self.resized
+
+    def prepare(self, frame, objects=None):
+        """Returns JPEG bytes for `frame` (BGR)."""
+        if self.crop and objects:
+            frame = self._crop(frame, objects)
+        image = self._resize(frame)
+
+        while True:
+            ok, buf = cv2.imencode(".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+            if not ok:
+                raise ValueError("JPEG encoding failed")
+            size = len(buf)
+            if not self.max_bytes or size <= self.max_bytes or self.quality <= self.MIN_QUALITY:
+                break
+            self.quality = max(self.MIN_QUALITY, self.quality - self.QUALITY_STEP)
+
+        # Plenty of headroom: creep back up for the next call
+        if self.max_bytes and size < self.max_bytes * 0.6:
+            self.quality = min(self.max_quality, self.quality + self.QUALITY_STEP // 2)
+
+        self.last_size = size
+        return buf.tobytes()
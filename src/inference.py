@@ -0,0 +1,189 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import cv2
+import numpy as np
+import config
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+try:
+    import openvino as ov
+except ImportError:
+    ov = None
+
+
+def model_hash(model_path):
+    """Short content hash so a replaced .pt file never reuses a stale export."""
+    h = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def export_cached(model_path, fmt, imgsz, cache_dir=config.MODEL_CACHE_DIR):
+    """
+    Exports the YOLO model to `fmt` ("onnx" or "openvino") once and caches it on disk,
+    keyed by model hash and input size. Returns (artifact_path, names).
+    """
+    from ultralytics import YOLO
+
+    if not os.path.exists(model_path):
+        # Let ultralytics download the weights first so we can hash them
+        YOLO(model_path)
+
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    key = f"{stem}-{model_hash(model_path)}-{imgsz}"
+    suffix = ".onnx" if fmt == "onnx" else "_openvino_model"
+    target = os.path.join(cache_dir, key + suffix)
+    names_path = os.path.join(cache_dir, key + ".names.json")
+
+    if not (os.path.exists(target) and os.path.exists(names_path)):
+        print(f"Exporting {model_path} to {fmt} (imgsz={imgsz}), this only happens once...")
+        os.makedirs(cache_dir, exist_ok=True)
+        model = YOLO(model_path)
+        exported = model.export(format=fmt, imgsz=imgsz, verbose=False)
+        if os.path.exists(target):
+            shutil.rmtree(target) if os.path.isdir(target) else os.remove(target)
+        shutil.move(str(exported), target)
+        with open(names_path, "w", encoding="utf-8") as f:
+            json.dump({str(k): v for k, v in model.names.items()}, f)
+        logging.info(f"Cached {fmt} export at {target}")
+
+    with open(names_path, encoding="utf-8") as f:
+        names = {int(k): v for k, v in json.load(f).items()}
+    return target, names
+
+
+class TorchBackend:
+    """Default: ultralytics + PyTorch eager mode."""
+    def __init__(self, model_path=config.MODEL_PATH, threads=config.INFERENCE_THREADS):
+        from ultralytics import YOLO
+        if threads > 0: # Only when asked for; otherwise torch keeps its usual thread count
+            import torch
+            torch.set_num_threads(threads)
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+
+    def infer(self, frame):
+        """Returns (boxes_xyxy, class_ids, confidences) as NumPy arrays in frame pixels."""
+        results = self.model.predict(frame, conf=config.CONFIDENCE_THRESHOLD, verbose=False)
+        if not results:
+            return np.zeros((0, 4), np.float32), np.zeros(0, np.intp), np.zeros(0, np.float32)
+        boxes = results[0].boxes
+        return boxes.xyxy.cpu().numpy(), boxes.cls.cpu().numpy(), boxes.conf.cpu().numpy()
+
+
+class _CompiledBackend:
+    """Letterbox pre-processing and YOLO output decoding shared by the CPU runtimes."""
+    def __init__(self, imgsz):
+        self.imgsz = imgsz
+        self.canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)  # Reused every frame
+
+    def _preprocess(self, frame):
+        h, w = frame.shape[:2]
+        s = self.imgsz
+        r = min(s / h, s / w)
+        nh, nw = int(round(h * r)), int(round(w * r))
+        top, left = (s - nh) // 2, (s - nw) // 2
+        self.canvas[:] = 114
+        self.canvas[top:top + nh, left:left + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        blob = cv2.dnn.blobFromImage(self.canvas, 1 / 255.0, swapRB=True)  # (1, 3, s, s) float32 RGB
+        return blob, r, left, top
+
+    def _postprocess(self, output, frame_shape, r, left, top):
+        output = np.asarray(output)[0]
+        conf_thres = config.CONFIDENCE_THRESHOLD
+
+        if output.ndim == 2 and output.shape[-1] == 6:
+            # End-to-end (NMS-free) head: [x1, y1, x2, y2, score, cls] per row
+            keep = output[:, 4] >= conf_thres
+            boxes, confs, classes = output[keep, :4], output[keep, 4], output[keep, 5]
+        else:
+            # Classic head: (4 + num_classes, anchors) with cx, cy, w, h
+            preds = output.T
+            scores = preds[:, 4:]
+            classes = scores.argmax(axis=1)
+            confs = scores[np.arange(len(scores)), classes]
+            keep = confs >= conf_thres
+            xywh, confs, classes = preds[keep, :4], confs[keep], classes[keep]
+            boxes = np.empty_like(xywh)
+            boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+            boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+            if len(boxes):
+                idx = cv2.dnn.NMSBoxesBatched(
+                    np.column_stack([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]]).tolist(),
+                    confs.tolist(), classes.astype(int).tolist(), conf_thres, 0.45)
+                idx = np.asarray(idx, dtype=np.intp).reshape(-1)
+                boxes, confs, classes = boxes[idx], confs[idx], classes[idx]
+
+        # Undo letterbox back into frame pixels
+        boxes = (boxes - np.array([left, top, left, top], dtype=np.float32)) / r
+        h, w = frame_shape[:2]
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, w)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, h)
+        return boxes.astype(np.float32), classes.astype(np.intp), confs.astype(np.float32)
+
+    def infer(self, frame):
+        blob, r, left, top = self._preprocess(frame)
+        return self._postprocess(self._run(blob), frame.shape, r, left, top)
+
+
+class OnnxBackend(_CompiledBackend):
+    def __init__(self, model_path=config.MODEL_PATH, imgsz=config.INFERENCE_IMGSZ, threads=config.INFERENCE_THREADS):
+        super().__init__(imgsz)
+        path, self.names = export_cached(model_path, "onnx", imgsz)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoBackend(_CompiledBackend):
+    def __init__(self, model_path=config.MODEL_PATH, imgsz=config.INFERENCE_IMGSZ, threads=config.INFERENCE_THREADS):
+        super().__init__(imgsz)
+        path, self.names = export_cached(model_path, "openvino", imgsz)
+        xml = next(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".xml"))
+        core = ov.Core()
+        # OpenVINO keeps its own compiled-blob cache, which makes later start-ups much faster
+        core.set_property({"CACHE_DIR": os.path.join(config.MODEL_CACHE_DIR, "openvino_cache")})
+        props = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads > 0:
+            props["INFERENCE_NUM_THREADS"] = threads
+        self.compiled = core.compile_model(core.read_model(xml), "CPU", props)
+        self.output = self.compiled.output(0)
+
+    def _run(self, blob):
+        return self.compiled(blob)[self.output]
+
+
+def create_backend(name=config.INFERENCE_BACKEND, model_path=config.MODEL_PATH):
+    """
+    Returns an inference backend by name ("torch", "onnx", "openvino").
+    Falls back to PyTorch if the requested runtime is missing or the export fails.
+    """
+    try:
+        if name == "onnx":
+            if ort is None:
+                raise ImportError("onnxruntime not installed (see requirements-cpu-runtimes.txt)")
+            return OnnxBackend(model_path)
+        if name == "openvino":
+            if ov is None:
+                raise ImportError("openvino not installed (see requirements-cpu-runtimes.txt)")
+            return OpenVinoBackend(model_path)
+    except Exception as e:
+        logging.error(f"Inference backend '{name}' unavailable, using torch: {e}")
+        print(f"⚠️ Inference backend '{name}' unavailable, using torch: {e}")
+    return TorchBackend(model_path)
@@ -0,0 +1,161 @@
+import re
+import time
+import random
+import logging
+import threading
+import config
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+
+
+class RateLimitError(Exception):
+    """Provider rejected the call for quota reasons (HTTP 429)."""
+    def __init__(self, message="Rate limited", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMBackend:
+    """
+    What LLMService needs from a model provider.
+    contents is a list of prompt strings and image parts made by image_part().
+    """
+    name = "base"
+
+    def image_part(self, jpeg_bytes):
+        return jpeg_bytes
+
+    def generate(self, contents):
+        """Returns the full answer text."""
+        raise NotImplementedError
+
+    def stream(self, contents):
+        """Yields text chunks. Raises NotImplementedError if the provider can't stream."""
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, api_key=config.GOOGLE_API_KEY, model_name=config.LLM_MODEL):
+        self.client = genai.Client(api_key=api_key)
+        self.model_name = model_name
+
+    def image_part(self, jpeg_bytes):
+        return types.Part.from_bytes(data=jpeg_bytes, mime_type="image/jpeg")
+
+    def _check_rate_limit(self, e):
+        if getattr(e, "code", None) == 429 or "RESOURCE_EXHAUSTED" in str(e):
+            raise RateLimitError(str(e)) from e
+
+    def generate(self, contents):
+        try:
+            response = self.client.models.generate_content(model=self.model_name, contents=contents)
+        except Exception as e:
+            self._check_rate_limit(e)
+            raise
+        return response.text
+
+    def stream(self, contents):
+        stream = getattr(self.client.models, "generate_content_stream", None)
+        if stream is None:
+            raise NotImplementedError("SDK has no streaming support")
+        try:
+            for chunk in stream(model=self.model_name, contents=contents):
+                yield chunk.text or ""
+        except Exception as e:
+            self._check_rate_limit(e)
+            raise
+
+
+class StubBackend(LLMBackend):
+    """
+    Offline stand-in for load tests. Answers in the same "There is ... ." shape as the real
+    prompt asks for, with seeded latency, random errors and periodic 429 bursts, so the
+    reasoner, rate limiter and audio path can be exercised without spending API quota.
+    """
+    name = "stub"
+    _DETECTION = re.compile(r"- (.+?) at (left|center|right) \(distance: (near|medium|far)\)")
+
+    def __init__(self, latency=config.LLM_STUB_LATENCY, error_rate=config.LLM_STUB_ERROR_RATE,
+                 burst_every=config.LLM_STUB_429_EVERY, burst_length=config.LLM_STUB_429_BURST,
+                 retry_after=config.LLM_STUB_RETRY_AFTER, seed=config.LLM_STUB_SEED):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _sample_latency(self):
+        kind, *args = self.latency
+        if kind == "fixed":
+            return args[0]
+        if kind == "uniform":
+            return self.rng.uniform(args[0], args[1])
+        if kind == "lognormal":
+            return self.rng.lognormvariate(args[0], args[1])
+        raise ValueError(f"Unknown latency distribution: {kind}")
+
+    def _begin(self):
+        """Decides this call's fate up front (deterministic for a given seed and call order)."""
+        with self.lock:
+            self.calls += 1
+            n = self.calls
+            latency = self._sample_latency()
+            failed = self.rng.random() < self.error_rate
+        if self.burst_every and (n - 1) % self.burst_every < self.burst_length and n > self.burst_length:
+            time.sleep(min(latency, 0.05))
+            raise RateLimitError("Stub 429 burst", retry_after=self.retry_after)
+        if failed:
+            time.sleep(latency)
+            raise RuntimeError("Stub backend injected error")
+        return latency
+
+    def _answer(self, contents):
+        prompt = next((c for c in contents if isinstance(c, str)), "")
+        match = self._DETECTION.search(prompt)
+        if not match:
+            return "There is nothing directly in your way. Continue straight ahead."
+        label, position, distance = match.groups()
+        where = "ahead of you" if position == "center" else f"on your {position}"
+        advice = "Stop and wait." if "[DANGEROUS]" in prompt else "Proceed with care."
+        return f"There is a {distance} {label} {where}. {advice}"
+
+    def generate(self, contents):
+        time.sleep(self._begin())
+        return self._answer(contents)
+
+    def stream(self, contents):
+        latency = self._begin()
+        words = self._answer(contents).split(" ")
+        # Time to first chunk is about a third of the total, the rest trickles in
+        time.sleep(latency / 3)
+        step = (latency * 2 / 3) / max(len(words), 1)
+        for i, word in enumerate(words):
+            yield word if i == 0 else " " + word
+            time.sleep(step)
+
+
+def create_llm_backend(name=config.LLM_BACKEND):
+    """Returns the configured backend, or None if it cannot be used (LLMService then uses its heuristic)."""
+    if name == "stub":
+        print("Using offline stub LLM backend.")
+        return StubBackend()
+    if not genai:
+        logging.warning("google-genai library not installed. LLM features disabled.")
+        print("⚠️ google-genai library not installed.")
+        return None
+    if not config.GOOGLE_API_KEY:
+        logging.warning("No Google API Key found. LLM features disabled.")
+        return None
+    try:
+        return GeminiBackend()
+    except Exception as e:
+        logging.error(f"Failed to init Gemini Client: {e}")
+        return None
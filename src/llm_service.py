@@ -1,21 +1,41 @@
+import re
 import json
 import time
 import logging
 import threading
-import io
-import cv2
 import numpy as np
-from PIL import Image
-import config
-import logging
-import threading
 import config
 from src.data_logger import DataLogger
-from src.vector_store import VectorStore
-try:
-    from google import genai
-except ImportError:
-    genai = None
+from src.vector_store import VectorStore, describe_detection
+from src.vector_writer import VectorWriter
+from src.maintenance import MaintenanceJob
+from src.response_cache import ResponseCache, scene_signature
+from src.image_prep import ImagePreparer
+from src.retrieval import retrieve, format_hits
+from src.llm_backends import create_llm_backend, RateLimitError
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+class SentenceSplitter:
+    """Incrementally cuts streamed text into complete sentences."""
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        parts = _SENTENCE_END.split(self.buffer)
+        self.buffer = parts.pop() # May be an unfinished sentence
+        return [p.strip() for p in parts if p.strip()]
+
+    def flush(self):
+        tail, self.buffer = self.buffer.strip(), ""
+        return tail
+
+def split_sentences(text):
+    splitter = SentenceSplitter()
+    sentences = splitter.feed(text or "")
+    tail = splitter.flush()
+    return sentences + [tail] if tail else sentences
 
 class LLMService:
     def __init__(self):
@@ -27,43 +47,54 @@ class LLMService:
         self.logger = DataLogger()
         self.logged_objects = {} # Stores time of last log per label
         
-        # Configure Gemini (New SDK)
-        self.client = None
-        if genai and config.GOOGLE_API_KEY:
-            try:
-                self.client = genai.Client(api_key=config.GOOGLE_API_KEY)
-                # We don't need to "configure" or create a "model" object like before
-                # We just hold the client and specify model name during generation
-                self.model_name = 'gemini-2.0-flash' 
-            except Exception as e:
-                logging.error(f"Failed to init Gemini Client: {e}")
-                self.client = None
-        elif not genai:
-            logging.warning("google-genai library not installed. LLM features disabled.")
-            print("⚠️ google-genai library not installed.")
-        else:
-            logging.warning("No Google API Key found. LLM features disabled.")
+        # Gemini, or the offline stub (config.LLM_BACKEND). None -> heuristic answers only
+        self.backend = create_llm_backend()
+        # Called with a back-off in seconds when the provider answers 429 (set by AsyncLLMStage)
+        self.on_rate_limit = None
+        self.rate_limited = 0
+
+        # Downsized JPEG payloads for multimodal calls (buffers reused between calls)
+        self.image_prep = ImagePreparer()
+
+        # Recent answers keyed by scene signature; repeats skip the API entirely
+        self.response_cache = ResponseCache()
 
         # Initialize VectorStore in background to not block startup if slow
         self.vector_store = None
+        self.vector_writer = None
+        self.maintenance = None
         threading.Thread(target=self._init_vector_store, daemon=True).start()
 
     def _init_vector_store(self):
         try:
             self.vector_store = VectorStore()
+            self.vector_writer = VectorWriter(self.vector_store)
+            # Retention, roll-up of repeats and compaction while we run
+            self.maintenance = MaintenanceJob(self.vector_store, self.logger)
             logging.info("VectorStore initialized.")
         except Exception as e:
             logging.error(f"VectorStore init failed: {e}")
 
-    def generate_response(self, metadata_json, image_data=None, target_language=config.TARGET_LANGUAGE):
-        """
-        Generates a spoken response from the LLM based on metadata and optional image using Google Gemini.
-        """
-        data = json.loads(metadata_json)
-        objects = data.get("objects", [])
-        timestamp = data.get("timestamp")
-        
-        # Log & Embed for Session summary and RAG (Keep existing logic)
+    def close(self):
+        """Flushes pending vector store and log writes."""
+        if self.maintenance:
+            self.maintenance.stop()
+        if self.vector_writer:
+            self.vector_writer.close()
+        self.logger.close()
+
+    def _cache_key(self, objects, image_data=None):
+        frame = image_data if config.LLM_CACHE_IMAGE_HASH and isinstance(image_data, np.ndarray) else None
+        return scene_signature(objects, frame)
+
+    def cached_response(self, objects, image_data=None):
+        """Returns guidance already generated for an equivalent scene, or None."""
+        if not objects:
+            return None
+        return self.response_cache.get(self._cache_key(objects, image_data))
+
+    def record_observations(self, objects, timestamp):
+        """Log & Embed for Session summary and RAG."""
         if objects:
             for obj in objects:
                 label = obj['label']
@@ -83,16 +114,33 @@ class LLMService:
                     })
                     self.logged_objects[label] = current_time
 
-                # Vector Store Embedding (Async) - simplified usage
-                if self.vector_store:
-                    desc = f"A {obj['distance']} {label} at {obj['position']}."
-                    threading.Thread(target=self.vector_store.add, args=(desc, {"label": label, "timestamp": timestamp}), daemon=True).start()
+                # Vector Store Embedding (queued, written in batches by one thread)
+                if self.vector_writer:
+                    desc = describe_detection(label, obj['distance'], obj['position'])
+                    # Numeric ts so questions like "in the last 10 minutes" can filter on it
+                    self.vector_writer.put(desc, {"label": label, "timestamp": timestamp, "ts": current_time})
+
+    def generate_response(self, metadata_json, image_data=None, target_language=config.TARGET_LANGUAGE, on_sentence=None):
+        """
+        Generates a spoken response from the LLM based on metadata and optional image using Google Gemini.
+        If on_sentence is given, every sentence of the answer is passed to it as soon as it is
+        available (streamed when possible) and the full text is still returned.
+        """
+        data = json.loads(metadata_json)
+        objects = data.get("objects", [])
+        timestamp = data.get("timestamp")
+        
+        self.record_observations(objects, timestamp)
+
+        # SceneReasoner already checked the cache; store fresh answers for the next repeat
+        cache_key = self._cache_key(objects, image_data) if objects else None
 
         # Construct Prompt
         object_descriptions = []
         for obj in objects:
             desc = f"- {obj['label']} at {obj['position']} (distance: {obj['distance']})"
             if obj['is_dangerous']: desc += " [DANGEROUS]"
+            if obj.get('approaching'): desc += " [APPROACHING]"
             object_descriptions.append(desc)
         
         context_str = "\\n".join(object_descriptions) if object_descriptions else "No specific objects detected by basic sensors."
@@ -107,32 +155,84 @@ class LLMService:
             f"Keep it concise, under 2 sentences. Prioritize immediate safety hazards."
         )
 
-        # Call Gemini (Multimodal)
-        if self.client:
+        # Call the LLM (Multimodal)
+        if self.backend:
             try:
                 contents = [prompt]
                 if image_data is not None:
-                    # Convert numpy array (OpenCV) to PIL Image
                     if isinstance(image_data, np.ndarray):
-                        # OpenCV is BGR, PIL needs RGB
-                        img_rgb = cv2.cvtColor(image_data, cv2.COLOR_BGR2RGB)
-                        pil_img = Image.fromarray(img_rgb)
-                        contents.append(pil_img)
+                        # Resized, size-budgeted JPEG straight from BGR; the SDK sends it as-is
+                        jpeg = self.image_prep.prepare(image_data, objects)
+                        contents.append(self.backend.image_part(jpeg))
                     else:
                         logging.warning("Image data provided but not a numpy array. Skipping image.")
 
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=contents
-                )
-                return response.text
+                text, complete = None, True
+                if on_sentence and config.LLM_STREAMING:
+                    text, complete = self._stream(contents, on_sentence)
+
+                if text is None:
+                    text = self.backend.generate(contents)
+                    if on_sentence:
+                        for sentence in split_sentences(text):
+                            on_sentence(sentence)
+
+                # A truncated stream would be replayed to every matching scene; don't keep it
+                if cache_key is not None and text and complete:
+                    self.response_cache.put(cache_key, text)
+                return text
+            except RateLimitError as e:
+                self._rate_limited(e)
+                text = self._fallback_heuristic(objects)
             except Exception as e:
                 logging.error(f"Gemini API Error: {e}")
                 print(f"⚠️ Gemini API Error (Using Fallback): {e}")
-                return self._fallback_heuristic(objects)
+                text = self._fallback_heuristic(objects)
         else:
-            return self._fallback_heuristic(objects)
+            text = self._fallback_heuristic(objects)
+
+        if on_sentence:
+            for sentence in split_sentences(text):
+                on_sentence(sentence)
+        return text
+
+    def _stream(self, contents, on_sentence):
+        """
+        Streams the answer, handing each completed sentence to on_sentence.
+        Returns (text, complete): complete is False if the stream broke off part way, and
+        text is None if streaming failed before anything was delivered.
+        """
+        splitter = SentenceSplitter()
+        spoken = []
+        try:
+            for chunk in self.backend.stream(contents):
+                for sentence in splitter.feed(chunk):
+                    spoken.append(sentence)
+                    on_sentence(sentence)
+            tail = splitter.flush()
+            if tail:
+                spoken.append(tail)
+                on_sentence(tail)
+        except RateLimitError:
+            if not spoken:
+                raise # Retrying without streaming would just hit the quota again
+            logging.error("Gemini stream interrupted by rate limit")
+            return " ".join(spoken), False
+        except Exception as e:
+            if not spoken:
+                logging.warning(f"Gemini streaming unavailable, using non-streaming call: {e}")
+                return None, False
+            logging.error(f"Gemini stream interrupted: {e}")
+            return " ".join(spoken), False
+        return " ".join(spoken), True
 
+    def _rate_limited(self, e):
+        self.rate_limited += 1
+        backoff = e.retry_after or config.LLM_RATE_LIMIT_BACKOFF
+        logging.warning(f"LLM rate limited, backing off {backoff:.0f}s: {e}")
+        print(f"⚠️ LLM rate limited (Using Fallback), pausing {backoff:.0f}s")
+        if self.on_rate_limit:
+            self.on_rate_limit(backoff)
 
     def _fallback_heuristic(self, objects):
         """Fallback if LLM is unavailable"""
@@ -169,9 +269,11 @@ class LLMService:
             
         # 1. Retrieve Context
         try:
-            results = self.vector_store.query(question, n_results=5)
-            # metadata can contain timestamp, handle empty results
-            context_docs = results['documents'][0] if results and 'documents' in results and results['documents'] else []
+            # Time/label hints in the question narrow the search before similarity ranking.
+            # Labels come from everything in memory (earlier sessions too), not just this session
+            labels = self.vector_store.known_labels() | set(self.session_data["objects_seen"]) | config.DANGEROUS_OBJECTS
+            hits = retrieve(self.vector_store, question, labels, n_results=5)
+            context_docs = format_hits(hits) # Newest first
             context_str = "\\n".join(context_docs) if context_docs else "No relevant past detections found."
         except Exception as e:
             logging.error(f"RAG Query execution failed: {e}")
@@ -189,13 +291,12 @@ class LLMService:
         )
         
         # 3. Call LLM
-        if self.client:
+        if self.backend:
             try:
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=prompt
-                )
-                return response.text
+                return self.backend.generate([prompt])
+            except RateLimitError as e:
+                self._rate_limited(e)
+                return "I'm sorry, I couldn't process your question right now."
             except Exception as e:
                 logging.error(f"Gemini Memory Answer Error: {e}")
                 return "I'm sorry, I couldn't process your question right now."
@@ -0,0 +1,111 @@
+import json
+import time
+import logging
+import threading
+import config
+from src.rate_limiter import LLMRateLimiter
+from src.llm_service import split_sentences
+
+
+class AsyncLLMStage:
+    """
+    Runs LLMService.generate_response on its own thread so detection never waits on the network.
+
+    Scenes are handed to an LLMRateLimiter, which merges them into pending urgent/normal
+    lanes and releases one whenever the quota allows. A more urgent scene also marks the
+    in-flight call stale so its (now outdated) answer is never spoken.
+    Results are delivered through `on_response(text)` and the Future returned by submit().
+    With `on_sentence`, each sentence is also handed over as soon as it is generated
+    (streaming), which is what should feed speech.
+    """
+    def __init__(self, llm, on_response=None, limiter=None, on_sentence=None):
+        self.llm = llm
+        self.on_response = on_response
+        self.on_sentence = on_sentence
+        self.limiter = limiter or LLMRateLimiter()
+        self.cond = threading.Condition()
+        self.inflight = None
+        self.stale = 0    # Responses discarded because a more urgent scene arrived
+        self.stopped = False
+        # Provider 429s pause the limiter instead of being retried into the quota
+        llm.on_rate_limit = self.penalize
+
+        t = threading.Thread(target=self.worker, daemon=True)
+        t.start()
+
+    def submit(self, objects, frame=None, priority=0):
+        """Queues detections for the LLM. Returns a Future resolving to the response (None if dropped)."""
+        with self.cond:
+            future = self.limiter.offer(objects, frame, priority)
+            if self.inflight is not None and priority > self.inflight.priority:
+                self.inflight.stale = True
+            self.cond.notify()
+        return future
+
+    def worker(self):
+        while not self.stopped:
+            with self.cond:
+                scene = self.limiter.take()
+                while scene is None and not self.stopped:
+                    wait = self.limiter.wait_time()
+                    self.cond.wait(timeout=1.0 if wait is None else min(max(wait, 0.01), 1.0))
+                    scene = self.limiter.take()
+                if self.stopped:
+                    return
+                self.inflight = scene
+
+            metadata = {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "objects": list(scene.objects.values())
+            }
+
+            def sentence_ready(sentence, scene=scene):
+                # Stop talking as soon as a more urgent scene has superseded this one
+                if not scene.stale:
+                    self.on_sentence(sentence)
+
+            try:
+                response = self.llm.generate_response(
+                    json.dumps(metadata), image_data=scene.frame,
+                    on_sentence=sentence_ready if self.on_sentence else None
+                )
+            except Exception as e:
+                logging.error(f"LLM stage error: {e}")
+                response = None
+
+            with self.cond:
+                self.inflight = None
+                if scene.stale:
+                    self.stale += 1
+                    response = None
+
+            scene.future.set_result(response)
+            if response and self.on_response:
+                try:
+                    self.on_response(response)
+                except Exception as e:
+                    logging.error(f"LLM response callback failed: {e}")
+
+    def penalize(self, seconds):
+        with self.cond:
+            self.limiter.penalize(seconds)
+
+    def deliver(self, text):
+        """Hands an answer that didn't need the LLM (e.g. a cache hit) to the same callbacks."""
+        if self.on_sentence:
+            for sentence in split_sentences(text):
+                self.on_sentence(sentence)
+        if self.on_response:
+            self.on_response(text)
+
+    def stats(self):
+        with self.cond:
+            stats = self.limiter.stats()
+        stats["stale"] = self.stale
+        stats["rate_limited"] = self.llm.rate_limited
+        return stats
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
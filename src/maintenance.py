@@ -0,0 +1,100 @@
+import time
+import logging
+import threading
+from collections import defaultdict
+import config
+
+
+class MaintenanceJob:
+    """
+    Keeps the memory stores bounded while the app runs. Every `interval` seconds:
+
+    1. Retention: drops vector entries and log lines older than `retention` seconds.
+    2. Roll-up: repeated identical observations ("A far person at center.") seen with
+       gaps under `rollup_gap` become one record with first_seen / ts (last seen) / count.
+    3. Compaction: reclaims space from deleted rows (NumPy index; Chroma manages its own),
+       only once at least `compact_ratio` of the rows are dead. Compaction rewrites the whole
+       index and blocks queries meanwhile, so it shouldn't run for a handful of deletions.
+    """
+    def __init__(self, store, logger=None, interval=config.MAINTENANCE_INTERVAL,
+                 retention=config.MEMORY_RETENTION, rollup_gap=config.VECTOR_ROLLUP_GAP,
+                 compact_ratio=config.VECTOR_COMPACT_RATIO):
+        self.store = store
+        self.logger = logger
+        self.interval = interval
+        self.retention = retention
+        self.rollup_gap = rollup_gap
+        self.compact_ratio = compact_ratio
+        self.last_rollup = 0.0  # Only entries newer than this (minus the gap) are re-examined
+        self.stop_event = threading.Event()
+        self.stats = {"runs": 0, "expired": 0, "rolled_up": 0, "log_lines_pruned": 0, "compactions": 0}
+
+        t = threading.Thread(target=self.worker, daemon=True)
+        t.start()
+
+    def worker(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"Memory maintenance failed: {e}")
+
+    def run_once(self, now=None):
+        now = time.time() if now is None else now
+        if self.retention:
+            self._expire(now - self.retention)
+        if self.rollup_gap:
+            self._rollup(now)
+        collection = self.store.collection if self.store.ready else None
+        if hasattr(collection, "compact") and collection.dead_fraction() >= self.compact_ratio:
+            collection.compact()
+            self.stats["compactions"] += 1
+        self.stats["runs"] += 1
+        logging.info(f"Memory maintenance done: {self.stats}")
+
+    def _expire(self, cutoff):
+        if self.store.ready:
+            old = self.store.collection.get(where={"ts": {"$lt": cutoff}})
+            if old["ids"]:
+                self.store.collection.delete(ids=old["ids"])
+                self.stats["expired"] += len(old["ids"])
+        if self.logger:
+            self.stats["log_lines_pruned"] += self.logger.prune(cutoff)
+
+    def _rollup(self, now):
+        if not self.store.ready:
+            return
+        since = self.last_rollup - self.rollup_gap
+        recent = self.store.collection.get(where={"ts": {"$gte": since}})
+
+        by_text = defaultdict(list)
+        for doc_id, doc, meta in zip(recent["ids"], recent["documents"], recent["metadatas"]):
+            by_text[doc].append((meta.get("first_seen", meta["ts"]), meta["ts"], meta.get("count", 1), doc_id, meta))
+
+        texts, metadatas, replaced = [], [], []
+        for doc, sightings in by_text.items():
+            sightings.sort(key=lambda s: s[0])
+            run = [sightings[0]]
+            for s in sightings[1:] + [None]:
+                if s is not None and s[0] - max(r[1] for r in run) <= self.rollup_gap:
+                    run.append(s)
+                    continue
+                if len(run) > 1:
+                    last = max(run, key=lambda r: r[1])
+                    meta = dict(last[4])
+                    meta.update(first_seen=min(r[0] for r in run), ts=last[1], count=sum(r[2] for r in run))
+                    texts.append(doc)
+                    metadatas.append(meta)
+                    replaced.extend(r[3] for r in run)
+                run = [s]
+
+        if texts:
+            # Add the merged records before deleting the originals: a crash leaves duplicates, not gaps
+            if not self.store.add_many(texts, metadatas):
+                return
+            self.store.collection.delete(ids=replaced)
+            self.stats["rolled_up"] += len(replaced) - len(texts)
+        self.last_rollup = now
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,194 @@
+import time
+import asyncio
+import logging
+from collections import Counter
+import cv2
+import config
+
+
+def multipart_jpeg(jpeg_bytes, seq=0):
+    """One multipart part. X-Frame-Seq lets the web UI match the frame to its boxes."""
+    headers = f"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg_bytes)}\r\nX-Frame-Seq: {seq}\r\n\r\n"
+    return headers.encode() + jpeg_bytes + b'\r\n'
+
+
+def _snap(tiers, value):
+    """Index of the largest tier <= value (the smallest tier if value is below all of them)."""
+    if value is None:
+        return len(tiers) - 1
+    fits = [i for i, t in enumerate(tiers) if t <= value]
+    return fits[-1] if fits else 0
+
+
+class StreamClient:
+    """
+    One viewer's caps (from the query string) and the tier it currently receives.
+
+    Slow sends (longer than the frame interval) step the client down: quality first, then
+    resolution, then frame rate. A long run of fast sends steps it back up toward its caps.
+    """
+    SLOW_SENDS = 3   # Consecutive slow sends before stepping down
+    FAST_SENDS = 30  # Consecutive fast sends before stepping up
+    WIDTHS = tuple(config.STREAM_WIDTHS) + (None,)  # None = the source's own width
+
+    def __init__(self, width=None, quality=None, fps=None):
+        # No cap (or one above every tier) gets full resolution; adaptation can still step down
+        if width is None or width > max(config.STREAM_WIDTHS):
+            self.max_w = len(self.WIDTHS) - 1
+        else:
+            self.max_w = _snap(config.STREAM_WIDTHS, width)
+        self.max_q = _snap(config.STREAM_QUALITIES, quality)
+        self.max_fps = min(max(fps or config.STREAM_MAX_FPS, 1.0), config.STREAM_MAX_FPS)
+        self.w, self.q, self.fps = self.max_w, self.max_q, self.max_fps
+        self.slow = self.fast = 0
+
+    @property
+    def key(self):
+        return self.WIDTHS[self.w], config.STREAM_QUALITIES[self.q]
+
+    def record_send(self, seconds):
+        """Adapts to how long the last frame took to send. Returns True if the tier changed."""
+        interval = 1.0 / self.fps
+        if seconds > interval:
+            self.slow, self.fast = self.slow + 1, 0
+        elif seconds < interval / 2:
+            self.slow, self.fast = 0, self.fast + 1
+        else:
+            self.slow = self.fast = 0
+
+        if self.slow >= self.SLOW_SENDS:
+            self.slow = 0
+            if self.q > 0:
+                self.q -= 1
+            elif self.w > 0:
+                self.w -= 1
+            elif self.fps > 1:
+                self.fps = max(1.0, self.fps / 2)
+            else:
+                return False
+            return True
+        if self.fast >= self.FAST_SENDS:
+            self.fast = 0
+            # Undo in reverse order: frame rate, resolution, quality
+            if self.fps < self.max_fps:
+                self.fps = min(self.max_fps, self.fps * 2)
+            elif self.w < self.max_w:
+                self.w += 1
+            elif self.q < self.max_q:
+                self.q += 1
+            else:
+                return False
+            return True
+        return False
+
+
+class MJPEGBroadcaster:
+    """
+    Encode-once fan-out for /video_feed.
+
+    One producer task waits for new camera frames and (in a worker thread) encodes one JPEG
+    per (width, quality) tier that some viewer currently needs. Frames are sent clean;
+    overlays are drawn by the browser from the box stream.
+    Viewers on the same tier share the same bytes. Subscribers always get the newest frame,
+    so a slow client just skips frames instead of queueing them; it is also moved to a
+    cheaper tier (see StreamClient). With no subscribers nothing is encoded.
+    Must be used from a single event loop (the web server's).
+    """
+    def __init__(self, get_camera):
+        self.get_camera = get_camera
+        self.latest_seq = 0
+        self.parts = {} # (width, quality) -> multipart bytes of the latest frame
+        self.demand = Counter() # (width, quality) -> viewers on that tier
+        self.subscribers = 0
+        self.encoded = Counter()
+        self.task = None
+        self.new_frame = None # asyncio.Event, replaced after every frame
+
+    def _encode(self, ref, keys):
+        with ref:
+            frame = ref.frame # Read-only view; resize/imencode don't write to it
+            h, w = frame.shape[:2]
+            parts = {}
+            for width in {k[0] for k in keys}:
+                # Resize once per width, encode once per quality at that width
+                image = frame if width is None or width >= w else cv2.resize(frame, (width, max(1, h * width // w)), interpolation=cv2.INTER_AREA)
+                for key in keys:
+                    if key[0] != width:
+                        continue
+                    ok, buf = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), key[1]])
+                    if not ok:
+                        raise ValueError("JPEG encoding failed")
+                    parts[key] = multipart_jpeg(buf.tobytes(), ref.seq)
+        return parts
+
+    async def _produce(self):
+        last_seq = 0
+        camera = None
+        try:
+            while self.subscribers:
+                camera = self.get_camera()
+                if camera is None:
+                    await asyncio.sleep(0.1) # Camera not started yet
+                    continue
+                # Timeout so we notice when the last subscriber leaves
+                ref = await camera.wait_for_frame_async(last_seq, timeout=1.0, consumer="mjpeg")
+                if ref is None:
+                    continue
+                last_seq = ref.seq
+                keys = [k for k, n in self.demand.items() if n > 0]
+                try:
+                    parts = await asyncio.to_thread(self._encode, ref, keys)
+                except Exception as e:
+                    logging.error(f"MJPEG encode failed: {e}")
+                    continue
+                self.latest_seq, self.parts = last_seq, parts
+                self.encoded.update(parts.keys())
+                event, self.new_frame = self.new_frame, asyncio.Event()
+                event.set()
+        finally:
+            self.parts = {} # Don't greet the next viewer with a stale frame
+            if camera is not None:
+                # Max-speed replay must stop waiting for us; the next producer re-registers
+                # on its first wait_for_frame_async()
+                camera.leave("mjpeg")
+
+    async def stream(self, width=None, quality=None, fps=None):
+        """Multipart body for one client, capped at the given width / JPEG quality / fps."""
+        if self.new_frame is None:
+            self.new_frame = asyncio.Event()
+        client = StreamClient(width, quality, fps)
+        self.demand[client.key] += 1
+        self.subscribers += 1
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._produce())
+        sent = 0
+        next_due = 0.0
+        try:
+            while True:
+                part = self.parts.get(client.key)
+                if part is None or self.latest_seq <= sent:
+                    await self.new_frame.wait()
+                    continue
+                now = time.monotonic()
+                if now < next_due:
+                    await asyncio.sleep(next_due - now) # FPS cap; then send whatever is newest
+                    continue
+                sent = self.latest_seq
+                next_due = now + 1.0 / client.fps
+                yield part
+                # The server asks for the next chunk only after this one was written out
+                old_key = client.key
+                if client.record_send(time.monotonic() - now):
+                    self.demand[old_key] -= 1
+                    self.demand[client.key] += 1
+        finally:
+            self.demand[client.key] -= 1
+            self.subscribers -= 1
+
+    def stats(self):
+        return {
+            "subscribers": self.subscribers,
+            "tiers": {f"{f'{w}px' if w else 'full'}@q{q}": n for (w, q), n in self.demand.items() if n > 0},
+            "encoded": sum(self.encoded.values()),
+            "seq": self.latest_seq
+        }
@@ -0,0 +1,337 @@
+import os
+import re
+import json
+import zlib
+import logging
+import threading
+import numpy as np
+
+
+class HashingEmbedder:
+    """
+    Dependency-free fallback embedder: hashed word and character-trigram counts, L2-normalized.
+    Not semantic like MiniLM, but our stored texts are short templates, so overlap works well.
+    """
+    name = "hashing-256"
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def __call__(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            words = re.findall(r"[a-z0-9]+", text.lower())
+            grams = words + [w[j:j + 3] for w in words for j in range(max(len(w) - 2, 1))]
+            for g in grams:
+                h = zlib.crc32(g.encode())
+                out[i, h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        return out
+
+
+def default_embedder():
+    """MiniLM through chromadb's ONNX helper when it imports, otherwise HashingEmbedder."""
+    try:
+        from chromadb.utils import embedding_functions
+        return embedding_functions.DefaultEmbeddingFunction(), "minilm-l6-v2"
+    except Exception as e:
+        logging.warning(f"MiniLM embedder unavailable, using hashing embedder: {e}")
+        embedder = HashingEmbedder()
+        return embedder, embedder.name
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+_OPS = {
+    "$eq": lambda col, v: col == v,
+    "$ne": lambda col, v: col != v,
+    "$gt": lambda col, v: col > v,
+    "$gte": lambda col, v: col >= v,
+    "$lt": lambda col, v: col < v,
+    "$lte": lambda col, v: col <= v,
+}
+
+
+class NumpyCollection:
+    """
+    In-process vector index with the parts of the Chroma collection API VectorStore uses
+    (add / query / get / delete / count, `where` filters with $and/$or/$in/$eq/$gte/...).
+
+    Storage in `path`:
+      index.json   dim and embedder name
+      vectors.f32  normalized float32 rows, append-only, memory-mapped for search
+      meta.jsonl   one line per row {"id", "document", "metadata"}, plus {"deleted": [...]} tombstones
+    Search is brute-force cosine similarity with argpartition top-k.
+    """
+    def __init__(self, path, embed_fn=None, embedder_name=None):
+        if embed_fn is None:
+            embed_fn, embedder_name = default_embedder()
+        self.path = path
+        self.embed_fn = embed_fn
+        self.embedder_name = embedder_name or "custom"
+        self.lock = threading.Lock()
+        self.dim = None
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_of = {}     # id -> row
+        self._matrix = None  # Memmap, reopened after appends
+        self._columns = {}   # Metadata columns built on demand for `where`
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    # --- persistence ---
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        header_path = self._file("index.json")
+        if os.path.exists(header_path):
+            with open(header_path, encoding="utf-8") as f:
+                header = json.load(f)
+            self.dim = header["dim"]
+            stored_embedder = header.get("embedder")
+        else:
+            stored_embedder = None
+
+        deleted = set()
+        if os.path.exists(self._file("meta.jsonl")):
+            self._read_meta(deleted)
+
+        # Keep vectors and metadata the same length if a write was interrupted
+        rows = 0
+        if self.dim and os.path.exists(self._file("vectors.f32")):
+            rows = os.path.getsize(self._file("vectors.f32")) // (4 * self.dim)
+        if rows != len(self.ids):
+            logging.warning(f"Vector index out of sync ({rows} vectors, {len(self.ids)} rows); trimming.")
+            n = min(rows, len(self.ids))
+            del self.ids[n:], self.documents[n:], self.metadatas[n:]
+            if self.dim:
+                with open(self._file("vectors.f32"), "ab") as f:
+                    f.truncate(n * 4 * self.dim)
+            self._rewrite_meta()
+            if deleted:
+                with open(self._file("meta.jsonl"), "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"deleted": sorted(deleted)}) + "\n")
+
+        self.row_of = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        for doc_id in deleted:
+            if doc_id in self.row_of:
+                self.alive[self.row_of.pop(doc_id)] = False
+
+        if self.ids and stored_embedder and stored_embedder != self.embedder_name:
+            logging.warning(f"Vector index was built with {stored_embedder}; re-embedding with {self.embedder_name}.")
+            self.compact(reembed=True)
+
+    def _read_meta(self, deleted):
+        """Loads meta.jsonl rows and tombstones, tolerating damaged lines."""
+        path = self._file("meta.jsonl")
+        offset = 0
+        with open(path, "rb") as f:
+            lines = f.readlines()
+        for n, raw in enumerate(lines):
+            start, offset = offset, offset + len(raw)
+            try:
+                row = json.loads(raw)
+                ok = isinstance(row, dict) and ("deleted" in row or "id" in row)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                ok = False
+            if not ok:
+                if n == len(lines) - 1 and not raw.endswith(b"\n"):
+                    # Torn last record from an interrupted append: cut it off
+                    logging.warning(f"Vector index: dropping torn final record in {path}")
+                    with open(path, "ab") as f:
+                        f.truncate(start)
+                    break
+                if b'"deleted"' in raw:
+                    logging.warning(f"Vector index: skipping unreadable tombstone on line {n + 1} of {path}")
+                    continue
+                # Keep the row count lined up with vectors.f32: a dead placeholder for the lost row
+                logging.warning(f"Vector index: skipping unreadable row on line {n + 1} of {path}")
+                row = {"id": f"_unreadable_{n}"}
+                deleted.add(row["id"])
+            if "deleted" in row:
+                deleted.update(row["deleted"])
+                continue
+            self.ids.append(row["id"])
+            self.documents.append(row.get("document", ""))
+            self.metadatas.append(row.get("metadata") or {})
+
+    def _write_header(self):
+        with open(self._file("index.json"), "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "embedder": self.embedder_name}, f)
+
+    def _rewrite_meta(self, rows=None):
+        rows = range(len(self.ids)) if rows is None else rows
+        tmp = self._file("meta.jsonl.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for i in rows:
+                f.write(json.dumps({"id": self.ids[i], "document": self.documents[i], "metadata": self.metadatas[i]}) + "\n")
+        os.replace(tmp, self._file("meta.jsonl"))
+
+    def _vectors(self):
+        n = len(self.ids)
+        if not n:
+            return np.zeros((0, self.dim or 1), dtype=np.float32)
+        if self._matrix is None or self._matrix.shape[0] != n:
+            self._matrix = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(n, self.dim))
+        return self._matrix
+
+    # --- collection API ---
+
+    def count(self):
+        return int(self.alive.sum())
+
+    def dead_fraction(self):
+        """Share of stored rows that are deleted (space compact() would reclaim)."""
+        with self.lock:
+            return 1.0 - float(self.alive.mean()) if len(self.alive) else 0.0
+
+    def add(self, ids, documents, metadatas=None, embeddings=None):
+        metadatas = metadatas or [{} for _ in ids]
+        vectors = _normalize(embeddings if embeddings is not None else self.embed_fn(list(documents)))
+        with self.lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._write_header()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dim {vectors.shape[1]} != index dim {self.dim}")
+            # Vectors first: on a crash, _load trims the extra vectors rather than losing metadata
+            with open(self._file("vectors.f32"), "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self._file("meta.jsonl"), "a", encoding="utf-8") as f:
+                for doc_id, doc, meta in zip(ids, documents, metadatas):
+                    f.write(json.dumps({"id": doc_id, "document": doc, "metadata": meta}) + "\n")
+            start = len(self.ids)
+            self.ids.extend(ids)
+            self.documents.extend(documents)
+            self.metadatas.extend(metadatas)
+            self.row_of.update((doc_id, start + i) for i, doc_id in enumerate(ids))
+            self.alive = np.concatenate([self.alive, np.ones(len(ids), dtype=bool)])
+            self._columns.clear()
+
+    def _column(self, key, numeric):
+        col = self._columns.get((key, numeric))
+        if col is None:
+            if numeric:
+                col = np.array([m.get(key) if isinstance(m.get(key), (int, float)) else np.nan
+                                for m in self.metadatas], dtype=np.float64)
+            else:
+                col = np.empty(len(self.metadatas), dtype=object)
+                col[:] = [m.get(key) for m in self.metadatas]
+            self._columns[(key, numeric)] = col
+        return col
+
+    def _match(self, where):
+        """Boolean row mask for a Chroma-style `where` clause."""
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, cond in where.items():
+            if key == "$and":
+                for sub in cond:
+                    mask &= self._match(sub)
+            elif key == "$or":
+                any_mask = np.zeros(len(self.ids), dtype=bool)
+                for sub in cond:
+                    any_mask |= self._match(sub)
+                mask &= any_mask
+            else:
+                if not isinstance(cond, dict):
+                    cond = {"$eq": cond}
+                for op, value in cond.items():
+                    if op in ("$in", "$nin"):
+                        hit = np.isin(self._column(key, False), list(value))
+                        mask &= hit if op == "$in" else ~hit
+                    else:
+                        numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+                        mask &= _OPS[op](self._column(key, numeric), value)
+        return mask
+
+    def _select(self, where=None, ids=None):
+        mask = self.alive.copy()
+        if where:
+            mask &= self._match(where)
+        if ids is not None:
+            wanted = np.zeros(len(self.ids), dtype=bool)
+            wanted[[self.row_of[i] for i in ids if i in self.row_of]] = True
+            mask &= wanted
+        return np.flatnonzero(mask)
+
+    def query(self, query_texts=None, n_results=10, where=None, query_embeddings=None):
+        if query_embeddings is None:
+            query_embeddings = self.embed_fn(list(query_texts))
+        queries = _normalize(query_embeddings)
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self.lock:
+            rows = self._select(where)
+            vectors = self._vectors()
+            for q in queries:
+                if not len(rows):
+                    top, scores = rows, np.zeros(0, dtype=np.float32)
+                else:
+                    if len(rows) * 4 > len(self.ids):
+                        sims = (vectors @ q)[rows]  # Mostly unfiltered: one pass over the memmap
+                    else:
+                        sims = vectors[rows] @ q
+                    k = min(n_results, len(rows))
+                    best = np.argpartition(-sims, k - 1)[:k]
+                    best = best[np.argsort(-sims[best])]
+                    top, scores = rows[best], sims[best]
+                out["ids"].append([self.ids[i] for i in top])
+                out["documents"].append([self.documents[i] for i in top])
+                out["metadatas"].append([self.metadatas[i] for i in top])
+                out["distances"].append((1.0 - scores).tolist())  # Cosine distance, like Chroma's
+        return out
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        with self.lock:
+            start = offset or 0
+            rows = self._select(where, ids)[start:start + limit if limit is not None else None]
+            include = include or ("documents", "metadatas")
+            return {
+                "ids": [self.ids[i] for i in rows],
+                "documents": [self.documents[i] for i in rows] if "documents" in include else None,
+                "metadatas": [self.metadatas[i] for i in rows] if "metadatas" in include else None,
+            }
+
+    def delete(self, ids=None, where=None):
+        """Tombstones rows; the space comes back on compact()."""
+        with self.lock:
+            rows = self._select(where, ids)
+            if not len(rows):
+                return
+            gone = [self.ids[i] for i in rows]
+            with open(self._file("meta.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps({"deleted": gone}) + "\n")
+            self.alive[rows] = False
+            for doc_id in gone:
+                self.row_of.pop(doc_id, None)
+
+    def compact(self, reembed=False):
+        """Rewrites the files without deleted rows (and with fresh vectors if reembed)."""
+        with self.lock:
+            rows = np.flatnonzero(self.alive)
+            if reembed:
+                docs = [self.documents[i] for i in rows]
+                vectors = _normalize(self.embed_fn(docs)) if docs else np.zeros((0, 1), dtype=np.float32)
+                self.dim = vectors.shape[1]
+                self._write_header()
+            else:
+                vectors = np.array(self._vectors()[rows]) if len(rows) else np.zeros((0, self.dim or 1), dtype=np.float32)
+            self._matrix = None
+            tmp = self._file("vectors.f32.tmp")
+            with open(tmp, "wb") as f:
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            os.replace(tmp, self._file("vectors.f32"))
+            self._rewrite_meta(rows)
+            self.ids = [self.ids[i] for i in rows]
+            self.documents = [self.documents[i] for i in rows]
+            self.metadatas = [self.metadatas[i] for i in rows]
+            self.row_of = {doc_id: i for i, doc_id in enumerate(self.ids)}
+            self.alive = np.ones(len(self.ids), dtype=bool)
+            self._columns.clear()
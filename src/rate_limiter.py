@@ -0,0 +1,154 @@
+import time
+from concurrent.futures import Future
+import config
+
+
+class TokenBucket:
+    """Classic token bucket on the monotonic clock."""
+    def __init__(self, rate, capacity):
+        self.rate = rate          # Tokens per second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # Set after a provider 429
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def available(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return 0.0 if now < self.blocked_until else self.tokens
+
+    def consume(self, n=1):
+        self._refill(time.monotonic())
+        self.tokens -= n
+
+    def time_until(self, level, now=None):
+        """Seconds until at least `level` tokens are available."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        wait = max(0.0, (level - self.tokens) / self.rate) if self.rate > 0 else float("inf")
+        return max(wait, self.blocked_until - now)
+
+    def block(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+class PendingScene:
+    """Detections waiting for the next LLM slot. New detections are merged in, newest wins."""
+    __slots__ = ("objects", "frame", "priority", "future", "updated", "stale")
+
+    def __init__(self, priority):
+        self.objects = {}  # {track_id or label: detection dict}
+        self.frame = None
+        self.priority = priority
+        self.future = Future()
+        self.updated = time.monotonic()
+        self.stale = False
+
+    def merge(self, objects, frame):
+        self.updated = time.monotonic()
+        for o in objects:
+            self.objects[o.get('track_id', o['label'])] = o
+        if frame is not None:
+            self.frame = frame
+
+    def absorb(self, other):
+        """Folds another pending scene in; both callers get the same answer."""
+        for key, o in other.objects.items():
+            self.objects.setdefault(key, o)
+        if self.frame is None:
+            self.frame = other.frame
+        self.future.add_done_callback(lambda f: other.future.set_result(f.result()))
+
+
+class LLMRateLimiter:
+    """
+    Spends a fixed LLM quota where it matters.
+
+    - A token bucket matches the provider quota (LLM_REQUESTS_PER_MINUTE, burst LLM_BURST).
+    - Detections that arrive while no token is free are merged into one pending scene
+      per lane instead of being thrown away.
+    - The urgent lane (danger / approaching) is always served first and may use the
+      LLM_DANGER_RESERVE tokens that normal scenes leave untouched.
+    - A pending scene that gets no new detections for LLM_MAX_AGE is dropped rather than sent late.
+    Not thread-safe on its own; AsyncLLMStage calls it under its lock.
+    """
+    def __init__(self, per_minute=config.LLM_REQUESTS_PER_MINUTE, burst=config.LLM_BURST,
+                 reserve=config.LLM_DANGER_RESERVE, max_age=config.LLM_MAX_AGE):
+        self.bucket = TokenBucket(per_minute / 60.0, burst)
+        self.reserve = min(reserve, max(burst - 1, 0))
+        self.max_age = max_age
+        self.lanes = {1: None, 0: None} # priority -> PendingScene
+        self.sent = 0
+        self.throttled = 0 # Offers that had to wait for a token
+        self.merged = 0    # Offers folded into an already pending scene
+        self.dropped = 0   # Pending scenes that expired before a token was free
+
+    def _needed(self, priority):
+        # Normal traffic must leave the reserve for danger events
+        return 1 if priority else 1 + self.reserve
+
+    def offer(self, objects, frame=None, priority=0):
+        """Adds detections to the lane's pending scene. Returns that scene's Future."""
+        priority = 1 if priority else 0
+        scene = self.lanes[priority]
+        if scene is None:
+            scene = self.lanes[priority] = PendingScene(priority)
+        else:
+            self.merged += 1
+        scene.merge(objects, frame)
+        if self.bucket.available() < self._needed(priority):
+            self.throttled += 1
+        return scene.future
+
+    def _expire(self, now):
+        for priority, scene in self.lanes.items():
+            if scene is not None and now - scene.updated > self.max_age:
+                self.lanes[priority] = None
+                self.dropped += 1
+                scene.future.set_result(None)
+
+    def take(self):
+        """Returns the next PendingScene allowed to go out now, or None."""
+        now = time.monotonic()
+        self._expire(now)
+        available = self.bucket.available(now)
+        for priority in (1, 0):
+            scene = self.lanes[priority]
+            if scene is None or available < self._needed(priority):
+                continue
+            self.lanes[priority] = None
+            # Ride along: anything waiting in the normal lane goes with an urgent call
+            other = self.lanes[0]
+            if priority == 1 and other is not None:
+                self.lanes[0] = None
+                self.merged += 1
+                scene.absorb(other)
+            self.bucket.consume()
+            self.sent += 1
+            return scene
+        return None
+
+    def wait_time(self):
+        """Seconds until take() could return something (None when nothing is pending)."""
+        times = [self.bucket.time_until(self._needed(p)) for p, s in self.lanes.items() if s is not None]
+        return min(times) if times else None
+
+    def penalize(self, seconds):
+        """Provider said slow down (HTTP 429): stop sending for `seconds`."""
+        self.bucket.block(seconds)
+
+    def stats(self):
+        return {
+            "tokens": round(self.bucket.available(), 2),
+            "sent": self.sent,
+            "throttled": self.throttled,
+            "merged": self.merged,
+            "dropped": self.dropped,
+            "pending": [p for p, s in self.lanes.items() if s is not None]
+        }
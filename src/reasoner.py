@@ -1,19 +1,23 @@
 import time
-import json
+from concurrent.futures import Future
 import config
 from src.llm_service import LLMService
+from src.llm_stage import AsyncLLMStage
 
 class SceneReasoner:
-    def __init__(self):
+    def __init__(self, on_response=None, on_sentence=None):
         self.llm = LLMService()
-        self.cache = {} # {label: {'last_time': t, 'distance': d, 'position': p}}
+        # LLM calls run on their own thread; answers arrive through on_response(text),
+        # and sentence by sentence through on_sentence(text) while they are generated
+        self.llm_stage = AsyncLLMStage(self.llm, on_response, on_sentence=on_sentence)
+        self.cache = {} # {track_id or label: {'last_time': t, 'distance': d, 'position': p, 'approaching': a}}
         self.cooldown_normal = 10.0 # Don't repeat normal objects for 10s
         self.cooldown_danger = 3.0  # Repeat dangerous objects more often
-        self.last_llm_call = 0.0    # Timestamp of last actual LLM API call
 
     def process(self, detections, frame=None):
         """
-        Filters detections and sends to LLMService.
+        Filters detections and queues them for LLMService without waiting for the answer.
+        Returns a Future for the response, or None if nothing was worth sending.
         """
         if not detections:
             return None
@@ -25,14 +29,17 @@ class SceneReasoner:
             label = d['label']
             is_dangerous = d['is_dangerous']
             distance = d['distance']
+            approaching = d.get('approaching', False)
+            # Tracked objects are remembered individually, so two people are two entries
+            key = d.get('track_id', label)
             
             # Check Cache
             should_announce = False
             
-            if label not in self.cache:
+            if key not in self.cache:
                 should_announce = True
             else:
-                last_data = self.cache[label]
+                last_data = self.cache[key]
                 time_diff = current_time - last_data['last_time']
                 
                 # Rule 1: Time expiration
@@ -46,38 +53,52 @@ class SceneReasoner:
                 if dist_map[distance] > dist_map[last_data['distance']]:
                     should_announce = True
                 
-                # Rule 3: Dangerous and Approaching (Already covered by dist change, but prioritize)
+                # Rule 3: Tracker says it just started approaching (box growing fast)
+                if approaching and not last_data.get('approaching'):
+                    should_announce = True
             
             if should_announce:
                 relevant_objects.append(d)
                 # Update Cache
-                self.cache[label] = {
+                self.cache[key] = {
                     'last_time': current_time, 
                     'distance': distance,
-                    'position': d['position']
+                    'position': d['position'],
+                    'approaching': approaching
                 }
+            else:
+                self.cache[key]['approaching'] = approaching
+
+        # Track ids are never reused; drop entries that can no longer suppress anything
+        if len(self.cache) > 256:
+            self.cache = {k: v for k, v in self.cache.items()
+                          if current_time - v['last_time'] <= self.cooldown_normal}
 
         if not relevant_objects:
             return None
-        
-        # Check Global LLM Cooldown
-        time_since_last_call = current_time - self.last_llm_call
-        if time_since_last_call < config.LLM_COOLDOWN:
-            # Skip LLM call if too frequent
-            print(f"Skipping LLM call (Cooldown: {config.LLM_COOLDOWN - time_since_last_call:.1f}s remaining)")
-            return None
 
-        # Prepare JSON for "LLM"
-        metadata = {
-            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
-            "objects": relevant_objects
-        }
+        # Same scene as one we described recently: answer instantly, no API call, no quota spent
+        cached = self.llm.cached_response(relevant_objects, frame)
+        if cached:
+            self.llm.record_observations(relevant_objects, time.strftime("%Y-%m-%dT%H:%M:%S"))
+            self.llm_stage.deliver(cached)
+            future = Future()
+            future.set_result(cached)
+            return future
         
-        # Call LLM
-        response = self.llm.generate_response(json.dumps(metadata), image_data=frame)
-        if response:
-            self.last_llm_call = time.time()
-        return response
+        # Urgent scenes skip ahead of normal ones and pre-empt a less urgent in-flight call
+        priority = 1 if any(o['is_dangerous'] or o.get('approaching') for o in relevant_objects) else 0
+
+        # Camera frames are shared buffers that get reused; the LLM thread needs its own copy
+        image = frame.copy() if frame is not None else None
+
+        # The stage's rate limiter decides when this goes out; during throttling it is merged
+        # with later detections instead of being thrown away
+        return self.llm_stage.submit(relevant_objects, image, priority)
+
+    def stop(self):
+        self.llm_stage.stop()
+        self.llm.close()
 
     def get_summary(self):
         return self.llm.summarize_session()
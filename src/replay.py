@@ -0,0 +1,197 @@
+import os
+import time
+import cv2
+import numpy as np
+import config
+
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v"}
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def open_source(src):
+    """
+    Returns a capture object for `src`.
+    Webcam indexes and stream URLs go to cv2.VideoCapture; video files, image directories
+    and "synthetic" are replayed deterministically with the same read()/release() interface.
+    """
+    if isinstance(src, str):
+        if src.startswith("synthetic"):
+            return SyntheticSource()
+        # Only local files: a URL ending in .mp4 is a live stream, not something to pace and loop
+        if os.path.isdir(src) or (os.path.isfile(src) and os.path.splitext(src)[1].lower() in VIDEO_EXTENSIONS):
+            return ReplaySource(src)
+    return cv2.VideoCapture(src)
+
+
+class _PacedSource:
+    """
+    Shared pacing for replay sources.
+    speed: "native" (source frame rate), "max" (as fast as the consumer reads) or a number (target FPS).
+    In "max" mode CameraFeed waits for its readers before reading the next frame (consumer_paced).
+    """
+    def __init__(self, native_fps, speed=config.REPLAY_SPEED, loop=config.REPLAY_LOOP):
+        self.native_fps = native_fps if native_fps and native_fps > 0 else config.FPS
+        if speed == "native":
+            self.fps = self.native_fps
+        elif speed == "max":
+            self.fps = None
+        else:
+            self.fps = float(speed)
+        self.consumer_paced = self.fps is None
+        self.loop = loop
+        self.frame_index = 0    # Frames delivered so far (keeps counting across loops)
+        self.media_time = 0.0   # Position of the last frame in the source, in seconds
+        self.timestamp = None   # Presentation time of the last frame (time.time() clock)
+        self.start_time = None
+
+    def _pace(self):
+        now = time.time()
+        if self.start_time is None:
+            self.start_time = now
+        if self.fps is None:
+            self.timestamp = now
+            return
+
+        due = self.start_time + self.frame_index / self.fps
+        if due > now:
+            time.sleep(due - now)
+        elif now - due > 1.0 / self.fps:
+            # Consumer fell behind; restart the schedule instead of bursting to catch up
+            self.start_time = now - self.frame_index / self.fps
+            due = now
+        self.timestamp = due
+
+    def _deliver(self, frame, image, media_time):
+        self._pace()
+        self.media_time = media_time
+        self.frame_index += 1
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame
+
+    # cv2.VideoCapture compatibility
+    def set(self, prop, value):
+        return False
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.native_fps
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.frame_index
+        return 0.0
+
+
+class ReplaySource(_PacedSource):
+    """Replays a video file or a directory of images in place of a live camera."""
+    def __init__(self, path, speed=config.REPLAY_SPEED, loop=config.REPLAY_LOOP):
+        self.path = path
+        self.video = None
+        self.images = []
+        self.image_pos = 0
+        self.opened = False
+
+        if os.path.isdir(path):
+            self.images = sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+            )
+            self.opened = bool(self.images)
+            native_fps = config.FPS
+        else:
+            self.video = cv2.VideoCapture(path)
+            self.opened = self.video.isOpened()
+            native_fps = self.video.get(cv2.CAP_PROP_FPS) if self.opened else 0
+
+        super().__init__(native_fps, speed, loop)
+        print(f"Replay source: {path} ({'ok' if self.opened else 'FAILED'}, speed={speed}, loop={loop})")
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self, image=None):
+        if not self.opened:
+            return False, None
+        if self.video is not None:
+            return self._read_video(image)
+        return self._read_image(image)
+
+    def _read_video(self, image):
+        ok, frame = self.video.read(image)
+        if not ok and self.loop:
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.video.read(image)
+        if not ok:
+            return False, None
+        media_time = self.video.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        # VideoCapture already decoded into `image` when the shape allowed it, so no copy here
+        self._pace()
+        self.media_time = media_time
+        self.frame_index += 1
+        return True, frame
+
+    def _read_image(self, image):
+        if self.image_pos >= len(self.images):
+            if not self.loop:
+                return False, None
+            self.image_pos = 0
+        path = self.images[self.image_pos]
+        media_time = self.image_pos / self.native_fps
+        self.image_pos += 1
+
+        frame = cv2.imread(path)
+        if frame is None:
+            print(f"WARNING: Could not read replay image {path}")
+            return False, None
+        return self._deliver(frame, image, media_time)
+
+    def release(self):
+        if self.video is not None:
+            self.video.release()
+        self.opened = False
+
+
+class SyntheticSource(_PacedSource):
+    """
+    Deterministic generated scene (moving blocks over a gradient) for pipeline runs
+    that need no files and no camera. Frame N is always identical for a given seed.
+    """
+    def __init__(self, width=config.FRAME_WIDTH, height=config.FRAME_HEIGHT, objects=4, seed=0,
+                 speed=config.REPLAY_SPEED):
+        super().__init__(config.FPS, speed, loop=True)
+        rng = np.random.default_rng(seed)
+        self.width = width
+        self.height = height
+        self.background = np.empty((height, width, 3), dtype=np.uint8)
+        self.background[:] = np.linspace(40, 120, width, dtype=np.uint8)[None, :, None]
+        self.sizes = rng.integers(40, min(width, height) // 2, size=(objects, 2))
+        self.origins = rng.uniform(0, 1, size=(objects, 2))
+        self.velocities = rng.uniform(-0.01, 0.01, size=(objects, 2)) # Fraction of frame per frame
+        self.colors = rng.integers(0, 256, size=(objects, 3))
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self, image=None):
+        if not self.opened:
+            return False, None
+        if image is None or image.shape != self.background.shape:
+            image = np.empty_like(self.background)
+        np.copyto(image, self.background)
+
+        # Triangle wave keeps every block bouncing inside the frame
+        pos = (self.origins + self.velocities * self.frame_index) % 2.0
+        pos = np.where(pos > 1.0, 2.0 - pos, pos)
+        for (fx, fy), (w, h), color in zip(pos, self.sizes, self.colors):
+            x = int(fx * (self.width - w))
+            y = int(fy * (self.height - h))
+            image[y:y + h, x:x + w] = color
+
+        self._pace()
+        self.media_time = self.frame_index / self.native_fps
+        self.frame_index += 1
+        return True, image
+
+    def release(self):
+        self.opened = False
@@ -0,0 +1,94 @@
+import re
+import time
+import datetime
+import logging
+
+_UNITS = {"second": 1, "sec": 1, "minute": 60, "min": 60, "hour": 3600, "hr": 3600, "day": 86400}
+_COUNTS = {"a": 1, "an": 1, "one": 1, "couple of": 2, "few": 3, "two": 2, "three": 3, "five": 5, "ten": 10}
+_LAST = re.compile(
+    r"\b(?:last|past|previous)\s+(\d+|a|an|one|couple of|few|two|three|five|ten)?\s*"
+    r"(second|sec|minute|min|hour|hr|day)s?\b"
+)
+_AGO = re.compile(r"\b(\d+|a|an|one|couple of|few|two|three|five|ten)\s+(second|sec|minute|min|hour|hr|day)s?\s+ago\b")
+
+
+def _midnight(now):
+    d = datetime.datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    return d.timestamp()
+
+
+def parse_hints(question, labels=(), now=None):
+    """
+    Pulls a time window and object labels out of a question.
+    "Did you see a car in the last 10 minutes?" -> {"since": now - 600, "until": None, "labels": ["car"]}
+    """
+    now = time.time() if now is None else now
+    q = question.lower()
+    since = until = None
+
+    m = _LAST.search(q) or _AGO.search(q)
+    if m:
+        count = m.group(1) or "1"
+        count = int(count) if count.isdigit() else _COUNTS[count]
+        # "10 minutes ago" means around then; give it a little slack both ways
+        span = count * _UNITS[m.group(2)]
+        since = now - span * (1.5 if m.re is _AGO else 1)
+    elif "yesterday" in q:
+        until = _midnight(now)
+        since = until - 86400
+    elif "today" in q:
+        since = _midnight(now)
+    elif re.search(r"\bjust now\b|\ba moment ago\b", q):
+        since = now - 120
+
+    found = []
+    for label in labels:
+        name = label.lower()
+        # Also match simple plurals ("cars", "buses")
+        if re.search(rf"\b{re.escape(name)}(?:s|es)?\b", q):
+            found.append(label)
+    return {"since": since, "until": until, "labels": found}
+
+
+def build_where(hints):
+    """Chroma-style metadata filter for the hints, or None if there is nothing to filter on."""
+    clauses = []
+    if hints["since"] is not None:
+        clauses.append({"ts": {"$gte": hints["since"]}})
+    if hints["until"] is not None:
+        clauses.append({"ts": {"$lt": hints["until"]}})
+    if len(hints["labels"]) == 1:
+        clauses.append({"label": hints["labels"][0]})
+    elif hints["labels"]:
+        clauses.append({"label": {"$in": hints["labels"]}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def retrieve(store, question, labels=(), n_results=5, now=None):
+    """
+    Filters by the question's time and label hints, ranks the rest by similarity,
+    and returns [(document, metadata)] newest first.
+    """
+    hints = parse_hints(question, labels, now)
+    where = build_where(hints)
+    results = store.query(question, n_results=n_results, where=where)
+    if not results or not results.get("documents"):
+        return []
+    docs = results["documents"][0]
+    metas = (results.get("metadatas") or [[]])[0] or [{}] * len(docs)
+    hits = list(zip(docs, metas))
+    hits.sort(key=lambda h: (h[1] or {}).get("ts", 0), reverse=True)
+    logging.debug(f"Retrieved {len(hits)} events for {hints}")
+    return hits
+
+
+def format_hits(hits):
+    """One context line per event, with the time it was seen when known."""
+    lines = []
+    for doc, meta in hits:
+        ts = (meta or {}).get("ts")
+        when = time.strftime("%H:%M:%S", time.localtime(ts)) if ts else (meta or {}).get("timestamp")
+        lines.append(f"[{when}] {doc}" if when else doc)
+    return lines
@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+import config
+
+
+class DetectionScheduler:
+    """
+    Decides on every frame whether YOLO should run.
+
+    A cheap motion check (mean absolute difference of a small grayscale thumbnail)
+    runs on every frame. Motion or a dangerous object snaps the interval back to the
+    minimum; a static scene doubles it after every quiet detection, up to the maximum.
+    Intervals are counted in frames, like the old DETECTION_INTERVAL.
+    """
+    def __init__(self, min_interval=config.DETECTION_INTERVAL_MIN, max_interval=config.DETECTION_INTERVAL_MAX,
+                 motion_threshold=config.MOTION_THRESHOLD, thumb_size=config.MOTION_THUMB_SIZE):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.motion_threshold = motion_threshold
+        self.thumb_size = thumb_size  # (width, height)
+
+        self.interval = min_interval
+        self.frames_since = None  # None forces detection on the first frame
+        self.danger_present = False
+        self.motion = 0.0         # Last motion score (0-255 mean abs diff)
+
+        # Reused thumbnail buffers
+        self.small = np.empty((thumb_size[1], thumb_size[0], 3), dtype=np.uint8)
+        self.gray = np.empty((thumb_size[1], thumb_size[0]), dtype=np.uint8)
+        self.prev_gray = None
+        self.diff = np.empty_like(self.gray)
+
+    def _motion_score(self, frame):
+        cv2.resize(frame, self.thumb_size, dst=self.small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        if self.prev_gray is None:
+            self.prev_gray = self.gray.copy()
+            return 0.0
+        cv2.absdiff(self.gray, self.prev_gray, dst=self.diff)
+        self.prev_gray, self.gray = self.gray, self.prev_gray
+        return float(self.diff.mean())
+
+    def should_detect(self, frame):
+        """Call once per new frame. Returns True when detection should run on it."""
+        self.motion = self._motion_score(frame)
+        moving = self.motion >= self.motion_threshold
+
+        if self.frames_since is None:
+            self.frames_since = 0
+            return True
+
+        self.frames_since += 1
+        if moving or self.danger_present:
+            self.interval = self.min_interval
+        if self.frames_since >= self.interval:
+            self.frames_since = 0
+            return True
+        return False
+
+    def record(self, detections):
+        """Feeds the latest DetectionBatch back so the next interval can be chosen."""
+        self.danger_present = bool(detections.dangerous.any())
+        if detections.approaching is not None:
+            self.danger_present = self.danger_present or bool(detections.approaching.any())
+        if self.danger_present or self.motion >= self.motion_threshold:
+            self.interval = self.min_interval
+        else:
+            # Static scene: back off exponentially
+            self.interval = min(self.interval * 2, self.max_interval)
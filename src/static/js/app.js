@@ -14,15 +14,32 @@ document.addEventListener('DOMContentLoaded', () => {
     const modalInput = document.getElementById('modal-input');
     const modalSend = document.getElementById('modal-send-btn');
     const modalAnswer = document.getElementById('modal-answer');
+    const videoFeed = document.getElementById('video-feed');
+    const overlayCanvas = document.getElementById('overlay-canvas');
+    const overlayToggle = document.getElementById('overlay-toggle');
 
     // --- Config ---
-    const POLL_INTERVAL = 500; // ms
+    const POLL_INTERVAL = 500; // ms, only used if the event stream is unavailable
     const MAX_LOG_ENTRIES = 30;
+    const MAX_STREAM_FAILURES = 3; // Give up on /api/events after this many failed connects
+    const MAX_BOX_EVENTS = 64; // Box updates kept for matching against frames
+    const BOX_COLOR = '#22c55e';
+    const BOX_COLOR_DANGER = '#ef4444';
 
     // --- State ---
     let lastLogHash = "";
     let lastDetectionsHash = "";
     let guidancePaused = false;
+    let logLines = [];
+    let pollTimer = null;
+
+    // --- Overlay state ---
+    let showOverlays = localStorage.getItem('showOverlays') !== '0';
+    let boxEvents = []; // [{frame, boxes}] oldest first, from "boxes" events on /api/events
+    let lastBoxSeq = 0;
+    let frameSize = [640, 480]; // Size the box coordinates refer to
+    let shownBitmap = null; // Frame on the canvas (null while the <img> shows the feed)
+    let shownSeq = null; // Its sequence number
 
 
     // --- FPS tracker ---
@@ -43,52 +60,223 @@ document.addEventListener('DOMContentLoaded', () => {
     setInterval(updateTimestamp, 1000);
     updateTimestamp();
 
-    // --- Polling ---
-    async function fetchStatus() {
-        try {
-            const response = await fetch('/api/status');
-            if (!response.ok) throw new Error('Network response was not ok');
-
-            const data = await response.json();
-
-            // Connection state
+    // --- Status updates ---
+    // Applies a full status (poll / snapshot) or a delta with only the changed fields
+    function applyStatus(data, isDelta = false) {
+        // Connection state
+        if (data.status !== undefined || !isDelta) {
             statusText.textContent = data.status || 'Connected';
-            statusBadge.classList.add('connected');
-            statusBadge.classList.remove('error');
+        }
+        statusBadge.classList.add('connected');
+        statusBadge.classList.remove('error');
 
-            // Update detections (with simple dedupe)
+        // Update detections (with simple dedupe)
+        if (data.detections !== undefined || !isDelta) {
             const detHash = JSON.stringify(data.detections || []);
             if (detHash !== lastDetectionsHash) {
                 lastDetectionsHash = detHash;
                 renderDetections(data.detections || []);
             }
+        }
 
-            // Update LLM guidance (graceful fallback)
+        // Update LLM guidance (graceful fallback)
+        if (data.llm_response !== undefined || !isDelta) {
             renderGuidance(data.llm_response || data.guidance || null);
+        }
 
-            // Update FPS display from backend
-            if (data.fps !== undefined) {
-                if (fpsDisplay) fpsDisplay.textContent = `${data.fps} FPS`;
-            }
+        // Update FPS display from backend
+        if (data.fps !== undefined) {
+            if (fpsDisplay) fpsDisplay.textContent = `${data.fps} FPS`;
+        }
+
+        // Update logs: deltas carry only new entries
+        if (data.logs && Array.isArray(data.logs)) {
+            logLines = isDelta ? logLines.concat(data.logs).slice(-MAX_LOG_ENTRIES) : data.logs;
+            renderLogs(logLines);
+        }
+    }
 
-            // Update reports
-            const logCount = data.logs ? data.logs.length : 0;
-            // Diagnostic logging (comment out for production)
-            // if (logCount > 0 && lastLogHash === "") addLocalLog(`Receiving ${logCount} remote logs...`);
+    function showDisconnected() {
+        statusText.textContent = 'Disconnected';
+        statusBadge.classList.remove('connected');
+        statusBadge.classList.add('error');
+    }
 
-            // Update logs (only if changed)
-            if (data.logs && Array.isArray(data.logs)) {
-                renderLogs(data.logs);
-            }
+    // --- Polling (fallback) ---
+    async function fetchStatus() {
+        try {
+            const response = await fetch('/api/status');
+            if (!response.ok) throw new Error('Network response was not ok');
+
+            applyStatus(await response.json());
 
         } catch (error) {
             console.error('Error fetching status:', error);
-            statusText.textContent = 'Disconnected';
-            statusBadge.classList.remove('connected');
-            statusBadge.classList.add('error');
+            showDisconnected();
         }
     }
 
+    function startPolling() {
+        if (pollTimer) return;
+        addLocalLog('Live updates unavailable, polling status instead');
+        pollTimer = setInterval(fetchStatus, POLL_INTERVAL);
+    }
+
+    // --- Push updates (Server-Sent Events) ---
+    // The browser reconnects on its own and sends Last-Event-ID, so the server resumes where we left off
+    function startEventStream() {
+        if (!window.EventSource) {
+            startPolling();
+            return;
+        }
+        let failures = 0;
+        const source = new EventSource('/api/events');
+
+        source.addEventListener('open', () => { failures = 0; });
+        source.addEventListener('snapshot', (e) => applyStatus(JSON.parse(e.data)));
+        source.addEventListener('delta', (e) => applyStatus(JSON.parse(e.data), true));
+        source.addEventListener('boxes', onBoxes);
+        source.addEventListener('error', () => {
+            showDisconnected();
+            failures += 1;
+            if (failures >= MAX_STREAM_FAILURES) {
+                source.close();
+                startPolling();
+            }
+        });
+    }
+
+    // --- Video & overlays ---
+    // Frames arrive without overlays. Boxes come as "boxes" events keyed by frame sequence
+    // and are drawn here, so toggling them needs no server round trip.
+    function boxesForFrame(seq) {
+        if (!boxEvents.length) return [];
+        if (seq === null) return boxEvents[boxEvents.length - 1].boxes;
+        // Boxes are only sent when they change: use the last update at or before this frame
+        let match = boxEvents[0];
+        for (const ev of boxEvents) {
+            if (ev.frame > seq) break;
+            match = ev;
+        }
+        return match.boxes;
+    }
+
+    function renderVideo() {
+        if (!overlayCanvas) return;
+        const dpr = window.devicePixelRatio || 1;
+        const w = overlayCanvas.clientWidth;
+        const h = overlayCanvas.clientHeight;
+        if (overlayCanvas.width !== Math.round(w * dpr) || overlayCanvas.height !== Math.round(h * dpr)) {
+            overlayCanvas.width = Math.round(w * dpr);
+            overlayCanvas.height = Math.round(h * dpr);
+        }
+        const ctx = overlayCanvas.getContext('2d');
+        ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+        ctx.clearRect(0, 0, w, h);
+
+        // Same placement as the <img>'s object-fit: cover
+        const [fw, fh] = shownBitmap ? [shownBitmap.width, shownBitmap.height] : frameSize;
+        const scale = Math.max(w / fw, h / fh);
+        const ox = (w - fw * scale) / 2;
+        const oy = (h - fh * scale) / 2;
+        if (shownBitmap) ctx.drawImage(shownBitmap, ox, oy, fw * scale, fh * scale);
+        if (!showOverlays) return;
+
+        // Box coordinates are in full-size frame pixels; the feed may be a smaller tier
+        const bs = fw * scale / frameSize[0];
+        ctx.lineWidth = 2;
+        ctx.font = '12px sans-serif';
+        for (const [x1, y1, x2, y2, label, conf, danger] of boxesForFrame(shownSeq)) {
+            const color = danger ? BOX_COLOR_DANGER : BOX_COLOR;
+            ctx.strokeStyle = color;
+            ctx.fillStyle = color;
+            ctx.strokeRect(ox + x1 * bs, oy + y1 * bs, (x2 - x1) * bs, (y2 - y1) * bs);
+            ctx.fillText(`${label} ${conf.toFixed(2)}`, ox + x1 * bs, oy + y1 * bs - 5);
+        }
+    }
+
+    function onBoxes(e) {
+        const data = JSON.parse(e.data);
+        // Only the latest boxes are resent after a reconnect (or a server restart): start over
+        if (data.seq <= lastBoxSeq) boxEvents = [];
+        lastBoxSeq = data.seq;
+        if (data.size) frameSize = data.size;
+        boxEvents.push({ frame: data.frame || 0, boxes: data.boxes || [] });
+        if (boxEvents.length > MAX_BOX_EVENTS) boxEvents.shift();
+        // With the <img> fallback there is no frame event to redraw on
+        if (!shownBitmap) renderVideo();
+    }
+
+    function indexOfHeaderEnd(bytes) {
+        for (let i = 0; i + 3 < bytes.length; i++) {
+            if (bytes[i] === 13 && bytes[i + 1] === 10 && bytes[i + 2] === 13 && bytes[i + 3] === 10) return i;
+        }
+        return -1;
+    }
+
+    // Reads the MJPEG stream ourselves so each frame's X-Frame-Seq can be matched to its boxes.
+    // Falls back to the plain <img> if the browser can't do this or the stream breaks.
+    async function startVideoStream() {
+        if (!videoFeed || !overlayCanvas || !window.ReadableStream || !window.createImageBitmap) return;
+        const feedUrl = videoFeed.getAttribute('src');
+        try {
+            const response = await fetch(feedUrl);
+            if (!response.ok || !response.body) throw new Error('No stream body');
+            videoFeed.removeAttribute('src'); // Close the <img> connection; the canvas takes over
+            videoFeed.style.visibility = 'hidden';
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buf = new Uint8Array(0);
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                const joined = new Uint8Array(buf.length + value.length);
+                joined.set(buf);
+                joined.set(value, buf.length);
+                buf = joined;
+
+                // Take every complete part out of the buffer
+                while (true) {
+                    const end = indexOfHeaderEnd(buf);
+                    if (end < 0) break;
+                    const headers = decoder.decode(buf.subarray(0, end));
+                    const length = parseInt((/content-length:\s*(\d+)/i.exec(headers) || [])[1], 10);
+                    if (isNaN(length)) throw new Error('Part without Content-Length');
+                    if (buf.length < end + 4 + length) break;
+                    const jpeg = buf.slice(end + 4, end + 4 + length);
+                    buf = buf.subarray(end + 4 + length);
+
+                    const bitmap = await createImageBitmap(new Blob([jpeg], { type: 'image/jpeg' }));
+                    if (shownBitmap) shownBitmap.close();
+                    shownBitmap = bitmap;
+                    shownSeq = parseInt((/x-frame-seq:\s*(\d+)/i.exec(headers) || [])[1], 10) || null;
+                    renderVideo();
+                }
+            }
+        } catch (error) {
+            console.error('Video stream error, using <img> feed:', error);
+        }
+        // Stream ended: let the browser's own MJPEG handling take over
+        if (shownBitmap) shownBitmap.close();
+        shownBitmap = null;
+        shownSeq = null;
+        videoFeed.style.visibility = '';
+        videoFeed.setAttribute('src', feedUrl);
+        renderVideo();
+    }
+
+    if (overlayToggle) {
+        overlayToggle.classList.toggle('active', showOverlays);
+        overlayToggle.addEventListener('click', () => {
+            showOverlays = !showOverlays;
+            overlayToggle.classList.toggle('active', showOverlays);
+            localStorage.setItem('showOverlays', showOverlays ? '1' : '0');
+            renderVideo();
+        });
+    }
+    window.addEventListener('resize', renderVideo);
+
     // --- Render Detections ---
     function renderDetections(detections) {
         // Update count badge
@@ -301,6 +489,7 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
-    // Start polling
-    setInterval(fetchStatus, POLL_INTERVAL);
+    // Start live updates
+    startEventStream();
+    startVideoStream();
 });
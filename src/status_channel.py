@@ -0,0 +1,164 @@
+import json
+import asyncio
+import threading
+from collections import deque
+import config
+
+
+def _wake(fut):
+    if not fut.done():
+        fut.set_result(None)
+
+
+class StatusChannel:
+    """
+    Dashboard state pushed to subscribers as numbered deltas (served as Server-Sent Events).
+
+    update() compares the new state with the last published one and records an event with
+    only the fields that changed; new log lines go out as {"logs": [...new entries]}.
+    Each event is serialized once and the same text goes to every subscriber, so the cost
+    doesn't grow with viewers. The last `history` events are kept so a reconnecting client
+    can resume from its Last-Event-ID; anyone further behind gets a fresh snapshot.
+
+    publish() sends other event types on the same stream (e.g. overlay boxes), so a dashboard
+    needs one connection. Those are latest-wins: they carry their own "seq" field, have no
+    SSE id (Last-Event-ID keeps following the status events) and are not kept in history.
+    """
+    def __init__(self, history=config.STATUS_HISTORY, log_lines=20):
+        self.state = {}
+        self.logs = deque(maxlen=log_lines)
+        self.seq = 0
+        self.history = deque(maxlen=history) # (seq, sse text)
+        self.subscribers = 0
+        self.lock = threading.Lock()
+        self.async_waiters = [] # [(loop, future)] woken on every event
+        self.latest = {} # {event type: (seq, sse text)} for publish()
+        self.changes = 0 # Bumped by update() and publish(); what stream() waits on
+
+    def _format(self, kind, data, seq):
+        return f"id: {seq}\nevent: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+    def update(self, new_logs=(), **fields):
+        """Publishes whatever changed. Returns the new sequence number, or None if nothing did."""
+        with self.lock:
+            delta = {k: v for k, v in fields.items() if self.state.get(k, self) != v}
+            if new_logs:
+                self.logs.extend(new_logs)
+                delta["logs"] = list(new_logs)
+            if not delta:
+                return None
+            self.state.update(fields)
+            self.seq += 1
+            self.history.append((self.seq, self._format("delta", delta, self.seq)))
+            seq = self.seq
+            waiters = self._changed()
+        self._wake_all(waiters)
+        return seq
+
+    def publish(self, kind, **data):
+        """Sends a latest-wins `kind` event to every subscriber. Returns its seq."""
+        with self.lock:
+            seq = self.latest.get(kind, (0, None))[0] + 1
+            data = {"seq": seq, **data}
+            self.latest[kind] = (seq, f"event: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n")
+            waiters = self._changed()
+        self._wake_all(waiters)
+        return seq
+
+    def _changed(self):
+        # Called with the lock held; returns the waiters to wake once it is released
+        self.changes += 1
+        waiters, self.async_waiters = self.async_waiters, []
+        return waiters
+
+    def _wake_all(self, waiters):
+        for loop, fut in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, fut)
+            except RuntimeError:
+                pass # Loop already closed
+
+    def published_since(self, seen):
+        """SSE texts of publish() events newer than `seen` ({kind: seq}, updated in place)."""
+        with self.lock:
+            texts = []
+            for kind, (seq, text) in self.latest.items():
+                if seq > seen.get(kind, 0):
+                    seen[kind] = seq
+                    texts.append(text)
+            return texts
+
+    def snapshot(self):
+        """(seq, SSE text) with the complete current state."""
+        with self.lock:
+            data = dict(self.state)
+            if self.logs.maxlen:
+                data["logs"] = list(self.logs)
+            return self.seq, self._format("snapshot", data, self.seq)
+
+    def events_since(self, seq):
+        """(latest seq, [SSE texts after `seq`]), or None if they are no longer in history."""
+        with self.lock:
+            if seq > self.seq:
+                return None # From an earlier server run
+            if seq == self.seq:
+                return seq, []
+            if not self.history or self.history[0][0] > seq + 1:
+                return None
+            return self.seq, [text for s, text in self.history if s > seq]
+
+    async def wait_async(self, after_changes, timeout=None):
+        """Waits until anything was updated or published after `after_changes`. Returns False on timeout."""
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if self.changes > after_changes:
+                return True
+            fut = loop.create_future()
+            self.async_waiters.append((loop, fut))
+        try:
+            await asyncio.wait_for(fut, timeout)
+            return True
+        except asyncio.TimeoutError:
+            with self.lock:
+                if (loop, fut) in self.async_waiters:
+                    self.async_waiters.remove((loop, fut))
+            return False
+
+    async def stream(self, last_event_id=None, is_disconnected=None, keepalive=15.0):
+        """Async generator of SSE text for one subscriber."""
+        with self.lock:
+            self.subscribers += 1
+        try:
+            yield "retry: 2000\n\n"
+            changes = self.changes # Read before collecting, so nothing newer can be missed
+            seen = {}
+            resumed = self.events_since(int(last_event_id)) if str(last_event_id or "").isdigit() else None
+            if resumed is None:
+                seq, text = self.snapshot()
+                yield text
+            else:
+                seq, texts = resumed
+                for text in texts:
+                    yield text
+            for text in self.published_since(seen):
+                yield text
+
+            while not (is_disconnected and await is_disconnected()):
+                if not await self.wait_async(changes, keepalive):
+                    yield ": keep-alive\n\n"
+                    continue
+                changes = self.changes
+                caught_up = self.events_since(seq)
+                if caught_up is None:
+                    # Fell out of the history window (very slow client): start over
+                    seq, text = self.snapshot()
+                    yield text
+                else:
+                    seq, texts = caught_up
+                    for text in texts:
+                        yield text
+                for text in self.published_since(seen):
+                    yield text
+        finally:
+            with self.lock:
+                self.subscribers -= 1
@@ -0,0 +1,174 @@
+import itertools
+import numpy as np
+import config
+from src.detections import DetectionBatch, danger_table
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+class Track:
+    __slots__ = ("id", "box", "velocity", "class_id", "confidence", "last_time", "hits", "growth", "missed")
+
+    def __init__(self, track_id, box, class_id, confidence, timestamp):
+        self.id = track_id
+        self.box = box
+        self.velocity = np.zeros(4, dtype=np.float32)  # px/second for each box edge
+        self.class_id = class_id
+        self.confidence = confidence
+        self.last_time = timestamp
+        self.hits = 1
+        self.growth = 0.0   # Smoothed d(log area)/dt; > 0 means the object is getting bigger
+        self.missed = False # Not matched in the latest update
+
+    def predict(self, timestamp):
+        dt = min(timestamp - self.last_time, config.TRACK_MAX_AGE)
+        return self.box + self.velocity * dt
+
+    @property
+    def approaching(self):
+        return self.hits >= 2 and self.growth >= config.TRACK_APPROACH_RATE
+
+
+class ObjectTracker:
+    """
+    IoU tracker with constant-velocity prediction.
+
+    update() matches a new DetectionBatch to existing tracks (greedy, same class,
+    highest IoU first) and tags it with persistent track ids plus an "approaching"
+    flag from each track's box growth rate. predict() moves the current tracks
+    forward for frames where detection was skipped.
+
+    Tracks unmatched for longer than max_age are parked for `reid_window` seconds; a new
+    detection of the same class overlapping a parked track's last box gets its old id back,
+    so an object that was briefly occluded or missed isn't announced as a new one.
+    """
+    def __init__(self, iou_threshold=config.TRACK_IOU_THRESHOLD, max_age=config.TRACK_MAX_AGE,
+                 reid_window=config.TRACK_REID_WINDOW):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.reid_window = reid_window
+        self.tracks = []
+        self.lost = [] # Expired tracks that can still be re-acquired
+        self.ids = itertools.count(1)
+        self.labels = None
+        self.danger_mask = None
+
+    def update(self, batch, timestamp):
+        """Returns `batch` with track ids and approaching flags attached."""
+        if batch.labels is not self.labels:
+            self.labels = batch.labels
+            self.danger_mask = danger_table(batch.labels)
+
+        # Park tracks that have not been matched for too long; forget parked ones after the window
+        expired = [t for t in self.tracks if timestamp - t.last_time > self.max_age]
+        if expired:
+            self.tracks = [t for t in self.tracks if timestamp - t.last_time <= self.max_age]
+            self.lost.extend(expired)
+        self.lost = [t for t in self.lost if timestamp - t.last_time <= self.reid_window]
+
+        n = len(batch)
+        track_ids = np.zeros(n, dtype=np.intp)
+        approaching = np.zeros(n, dtype=bool)
+        assigned = [None] * n
+
+        if self.tracks and n:
+            predicted = np.array([t.predict(timestamp) for t in self.tracks], dtype=np.float32)
+            iou = iou_matrix(predicted, batch.boxes)
+            track_cls = np.array([t.class_id for t in self.tracks])
+            iou[track_cls[:, None] != batch.class_ids[None, :]] = 0.0
+
+            # Greedy assignment, best overlaps first
+            pairs = np.argwhere(iou >= self.iou_threshold)
+            order = np.argsort(-iou[pairs[:, 0], pairs[:, 1]])
+            used_tracks = set()
+            for ti, di in pairs[order]:
+                if ti in used_tracks or assigned[di] is not None:
+                    continue
+                used_tracks.add(ti)
+                assigned[di] = self.tracks[ti]
+
+        self._reacquire(batch, assigned, timestamp)
+
+        for t in self.tracks:
+            t.missed = True
+
+        for i in range(n):
+            box = batch.boxes[i]
+            track = assigned[i]
+            if track is None:
+                track = Track(next(self.ids), box.copy(), int(batch.class_ids[i]), float(batch.confidences[i]), timestamp)
+                self.tracks.append(track)
+            else:
+                dt = timestamp - track.last_time
+                if dt > 0:
+                    old_area = max((track.box[2] - track.box[0]) * (track.box[3] - track.box[1]), 1.0)
+                    new_area = max((box[2] - box[0]) * (box[3] - box[1]), 1.0)
+                    track.velocity = 0.5 * track.velocity + 0.5 * (box - track.box) / dt
+                    track.growth = 0.5 * track.growth + 0.5 * float(np.log(new_area / old_area)) / dt
+                track.box = box.copy()
+                track.confidence = float(batch.confidences[i])
+                track.last_time = timestamp
+                track.hits += 1
+            track.missed = False
+            track_ids[i] = track.id
+            approaching[i] = track.approaching
+
+        batch.set_tracks(track_ids, approaching)
+        return batch
+
+    def _reacquire(self, batch, assigned, timestamp):
+        """Gives unmatched detections the id of a parked track at the same spot (same class)."""
+        free = [i for i, t in enumerate(assigned) if t is None]
+        if not self.lost or not free:
+            return
+        # Last known boxes: extrapolating velocity across a long gap is mostly noise
+        iou = iou_matrix(np.array([t.box for t in self.lost], dtype=np.float32), batch.boxes[free])
+        lost_cls = np.array([t.class_id for t in self.lost])
+        iou[lost_cls[:, None] != batch.class_ids[free][None, :]] = 0.0
+
+        pairs = np.argwhere(iou >= self.iou_threshold)
+        order = np.argsort(-iou[pairs[:, 0], pairs[:, 1]])
+        revived = set()
+        for li, fi in pairs[order]:
+            di = free[fi]
+            if li in revived or assigned[di] is not None:
+                continue
+            revived.add(li)
+            track = self.lost[li]
+            # Motion estimates are stale after the gap; start them over
+            track.velocity = np.zeros(4, dtype=np.float32)
+            track.growth = 0.0
+            track.last_time = timestamp
+            assigned[di] = track
+            self.tracks.append(track)
+        self.lost = [t for i, t in enumerate(self.lost) if i not in revived]
+
+    def predict(self, frame_shape, timestamp):
+        """DetectionBatch of where the currently visible tracks should be at `timestamp`."""
+        live = [t for t in self.tracks if not t.missed]
+        if not live or self.labels is None:
+            return DetectionBatch.empty(self.labels if self.labels is not None else ())
+
+        boxes = np.array([t.predict(timestamp) for t in live], dtype=np.float32)
+        h, w = frame_shape[:2]
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, w)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, h)
+        batch = DetectionBatch.from_arrays(
+            boxes,
+            np.array([t.class_id for t in live], dtype=np.intp),
+            np.array([t.confidence for t in live], dtype=np.float32),
+            frame_shape, self.labels, self.danger_mask
+        )
+        batch.set_tracks(np.array([t.id for t in live], dtype=np.intp),
+                         np.array([t.approaching for t in live], dtype=bool))
+        return batch
@@ -1,26 +1,125 @@
 try:
     import chromadb
-except ImportError as e:
+    from chromadb.utils import embedding_functions
+except Exception as e: # Broken installs raise more than ImportError
     import logging
     logging.error(f"Failed to import chromadb: {e}")
     chromadb = None
+import os
 import uuid
 import logging
+import threading
+import numpy as np
+import config
+from src.numpy_index import NumpyCollection
 
-class VectorStore:
-    def __init__(self, collection_name="vision_events"):
-        self.ready = False
-        if chromadb is None:
-            logging.warning("chromadb not installed. VectorStore disabled.")
-            return
+def describe_detection(label, distance, position):
+    """The text stored per detection. Kept to a fixed template so its embeddings can be reused."""
+    return f"A {distance} {label} at {position}."
+
+class EmbeddingTable:
+    """
+    Memoized embeddings for the templated detection descriptions.
+    There are only labels x distances x positions distinct strings, so each is embedded
+    once (in batches), kept in memory and persisted to an .npz next to the database.
+    """
+    MAX_ENTRIES = 5000  # Far above the template vocabulary; guards against free text
 
+    def __init__(self, embed_fn, path):
+        self.embed_fn = embed_fn
+        self.path = path
+        self.vectors = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
         try:
-            # Persistent client saves to disk
-            self.client = chromadb.PersistentClient(path="./chroma_db")
-            self.collection = self.client.get_or_create_collection(name=collection_name)
-            self.ready = True
+            data = np.load(self.path, allow_pickle=False)
+            self.vectors = dict(zip(data["texts"].tolist(), data["vectors"]))
+            logging.info(f"Loaded {len(self.vectors)} cached embeddings.")
         except Exception as e:
-            logging.error(f"Failed to initialize VectorStore: {e}")
+            logging.warning(f"Ignoring unreadable embedding cache {self.path}: {e}")
+
+    def save(self):
+        with self.lock:
+            if not self.vectors:
+                return
+            texts = list(self.vectors)
+            vectors = np.stack([self.vectors[t] for t in texts])
+        tmp = self.path + ".tmp.npz"
+        np.savez(tmp, texts=np.array(texts), vectors=vectors)
+        os.replace(tmp, self.path)
+
+    def lookup(self, texts):
+        """Returns one embedding (list of floats) per text, embedding only unseen ones."""
+        with self.lock:
+            missing = list(dict.fromkeys(t for t in texts if t not in self.vectors))
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+
+        fresh = {}
+        if missing:
+            fresh = dict(zip(missing, np.asarray(self.embed_fn(missing), dtype=np.float32)))
+            if len(self.vectors) + len(fresh) <= self.MAX_ENTRIES:
+                with self.lock:
+                    self.vectors.update(fresh)
+                try:
+                    self.save()
+                except Exception as e:
+                    logging.warning(f"Could not persist embedding cache: {e}")
+
+        with self.lock:
+            return [(fresh[t] if t in fresh else self.vectors[t]).tolist() for t in texts]
+
+class VectorStore:
+    """
+    RAG memory. Backed by ChromaDB, or by the in-process NumpyCollection when
+    config.VECTOR_BACKEND is "numpy" (or "auto" and Chroma can't be imported/opened).
+    """
+    def __init__(self, collection_name="vision_events", path="./chroma_db", backend=config.VECTOR_BACKEND):
+        self.ready = False
+        self.backend = None
+        self.embeddings = None
+        self.labels = set() # Distinct "label" metadata values (see known_labels)
+        self.labels_lock = threading.Lock()
+
+        if backend in ("auto", "chroma"):
+            if chromadb is None:
+                logging.warning("chromadb not installed.")
+            else:
+                try:
+                    # Persistent client saves to disk
+                    self.client = chromadb.PersistentClient(path=path)
+                    # Same model the collection would use by default, so stored and query vectors match
+                    embed_fn = embedding_functions.DefaultEmbeddingFunction()
+                    self.collection = self.client.get_or_create_collection(name=collection_name, embedding_function=embed_fn)
+                    self.embeddings = EmbeddingTable(embed_fn, os.path.join(path, f"{collection_name}_embeddings.npz"))
+                    self.backend = "chroma"
+                    self.ready = True
+                    self._start_label_scan()
+                    return
+                except Exception as e:
+                    logging.error(f"Failed to initialize ChromaDB: {e}")
+
+        if backend in ("auto", "numpy"):
+            try:
+                index_dir = os.path.join(config.VECTOR_INDEX_DIR, collection_name)
+                self.collection = NumpyCollection(index_dir)
+                name = self.collection.embedder_name
+                self.embeddings = EmbeddingTable(self.collection.embed_fn, os.path.join(index_dir, f"templates_{name}.npz"))
+                self.backend = "numpy"
+                self.ready = True
+                self._start_label_scan()
+                logging.info(f"Using NumPy vector index ({self.collection.count()} entries, {name}).")
+                return
+            except Exception as e:
+                logging.error(f"Failed to initialize NumPy vector index: {e}")
+
+        logging.warning("VectorStore disabled.")
 
     def add(self, text, metadata):
         """
@@ -34,23 +133,77 @@ class VectorStore:
             doc_id = str(uuid.uuid4())
             self.collection.add(
                 documents=[text],
+                embeddings=self.embeddings.lookup([text]),
                 metadatas=[metadata],
                 ids=[doc_id]
             )
+            self._note_labels([metadata])
         except Exception as e:
             logging.error(f"VectorStore add failed: {e}")
 
-    def query(self, query_text, n_results=3):
+    def add_many(self, texts, metadatas):
+        """
+        Adds several entries in one collection call (one embedding batch, one write).
+        Returns True on success.
+        """
+        if not self.ready or not texts:
+            return False
+
+        try:
+            texts = list(texts)
+            self.collection.add(
+                documents=texts,
+                embeddings=self.embeddings.lookup(texts), # No model inference for known templates
+                metadatas=list(metadatas),
+                ids=[str(uuid.uuid4()) for _ in texts]
+            )
+            self._note_labels(metadatas)
+            return True
+        except Exception as e:
+            logging.error(f"VectorStore add_many failed: {e}")
+            return False
+
+    def _note_labels(self, metadatas):
+        with self.labels_lock:
+            self.labels.update(m["label"] for m in metadatas if m and m.get("label"))
+
+    def _start_label_scan(self):
+        threading.Thread(target=self._scan_labels, daemon=True).start()
+
+    def _scan_labels(self, page=5000):
+        """Background start-up pass collecting labels already stored, metadata only, a page at a time."""
+        offset = 0
+        try:
+            while True:
+                metadatas = self.collection.get(limit=page, offset=offset, include=["metadatas"])["metadatas"] or []
+                self._note_labels(metadatas)
+                if len(metadatas) < page:
+                    break
+                offset += page
+        except Exception as e:
+            logging.error(f"VectorStore label scan failed: {e}")
+
+    def known_labels(self):
+        """
+        Every object label stored so far, across sessions. Filled by a background scan at
+        start-up and kept up to date by add() / add_many(); never blocks on the collection.
+        """
+        with self.labels_lock:
+            return set(self.labels)
+
+    def query(self, query_text, n_results=3, where=None):
         """
-        Returns similar past events.
+        Returns similar past events, optionally pre-filtered by a metadata `where` clause.
         """
         if not self.ready:
             return []
             
         try:
+            kwargs = {"where": where} if where else {}
             results = self.collection.query(
                 query_texts=[query_text],
-                n_results=n_results
+                n_results=n_results,
+                **kwargs
             )
             return results
         except Exception as e:
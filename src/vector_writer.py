@@ -0,0 +1,110 @@
+import time
+import logging
+import threading
+from collections import deque
+import config
+
+
+class VectorWriter:
+    """
+    Single background writer for the VectorStore.
+
+    Entries are queued (bounded) and written as one VectorStore.add_many batch once
+    `batch_size` entries are waiting or the oldest has waited `flush_interval` seconds.
+    When the queue is full, policy "drop_oldest" discards the oldest entry (observations
+    are replaceable), "block" makes the caller wait up to `block_timeout` for space.
+    """
+    def __init__(self, store, batch_size=config.VECTOR_BATCH_SIZE, flush_interval=config.VECTOR_FLUSH_INTERVAL,
+                 max_queue=config.VECTOR_QUEUE_SIZE, policy=config.VECTOR_QUEUE_POLICY, block_timeout=1.0):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.queue = deque()  # (text, metadata, enqueued_at)
+        self.cond = threading.Condition()
+        self.stopped = False
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.max_depth = 0
+
+        self.thread = threading.Thread(target=self.worker, daemon=True)
+        self.thread.start()
+
+    def put(self, text, metadata):
+        """Queues one document. Returns False if it (or an older entry) had to be dropped."""
+        with self.cond:
+            if self.stopped:
+                return False
+            ok = True
+            if len(self.queue) >= self.max_queue:
+                if self.policy == "block":
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self.queue) >= self.max_queue and not self.stopped:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.dropped += 1
+                            return False
+                        self.cond.wait(remaining)
+                else:
+                    self.queue.popleft()
+                    self.dropped += 1
+                    ok = False
+            self.queue.append((text, metadata, time.monotonic()))
+            self.max_depth = max(self.max_depth, len(self.queue))
+            if len(self.queue) >= self.batch_size:
+                self.cond.notify_all()
+            return ok
+
+    def _take_batch(self):
+        """Waits until a batch is due and pops it (called with the lock held)."""
+        while not self.stopped:
+            if len(self.queue) >= self.batch_size:
+                break
+            if self.queue:
+                wait = self.queue[0][2] + self.flush_interval - time.monotonic()
+                if wait <= 0:
+                    break
+                self.cond.wait(wait)
+            else:
+                self.cond.wait()
+        n = min(len(self.queue), self.batch_size)
+        batch = [self.queue.popleft() for _ in range(n)]
+        self.cond.notify_all()  # Wake producers blocked on a full queue
+        return batch
+
+    def _write(self, batch):
+        try:
+            self.store.add_many([b[0] for b in batch], [b[1] for b in batch])
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            logging.error(f"VectorWriter batch failed ({len(batch)} entries): {e}")
+
+    def worker(self):
+        while True:
+            with self.cond:
+                batch = self._take_batch()
+                if not batch and self.stopped:
+                    return
+            if batch:
+                self._write(batch)
+
+    def stats(self):
+        with self.cond:
+            return {
+                "depth": len(self.queue),
+                "max_depth": self.max_depth,
+                "written": self.written,
+                "batches": self.batches,
+                "dropped": self.dropped
+            }
+
+    def close(self, timeout=5.0):
+        """Flushes what is queued and stops the writer."""
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        self.thread.join(timeout)
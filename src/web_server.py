@@ -1,9 +1,8 @@
-import cv2
+import os
 import time
 import logging
 import threading
 import asyncio
-import json
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
@@ -13,9 +12,15 @@ from queue import Queue
 
 import config
 from src.camera import CameraFeed
-from src.detector import ObjectDetector
+from src.detector import create_detector
+from src.detections import DetectionBatch
 from src.reasoner import SceneReasoner
 from src.audio import AudioFeedback
+from src.scheduler import DetectionScheduler
+from src.tracker import ObjectTracker
+from src.data_logger import RecentLogBuffer
+from src.status_channel import StatusChannel
+from src.mjpeg import MJPEGBroadcaster
 
 # Configure logging
 logging.basicConfig(filename='system.log', level=logging.INFO, 
@@ -34,12 +39,12 @@ camera = None
 detector = None
 reasoner = None
 audio = None
-current_detections = []
-latest_frame = None
+current_detections = DetectionBatch.empty()
 latest_llm_response = "Welcome. System is listening."  # Store the latest LLM text
 system_status = "Initializing..."
 current_fps = 0
 lock = threading.Lock()
+status_channel = StatusChannel() # Pushes dashboard changes (and overlay boxes) to /api/events subscribers
 
 def get_camera():
     global camera
@@ -52,17 +57,28 @@ def get_detector():
     if detector is None:
         try:
             print("Loading Object Detector...")
-            detector = ObjectDetector()
+            detector = create_detector()
             print("Object Detector Loaded.")
         except Exception as e:
             logging.error(f"Failed to load detector: {e}")
             print(f"Error loading detector: {e}")
     return detector
 
+def on_llm_sentence(sentence):
+    """Runs on the LLM thread for every sentence as it is generated."""
+    get_audio().speak_sentence(sentence)
+
+def on_llm_response(message):
+    """Runs on the LLM thread once guidance is complete."""
+    global latest_llm_response
+    print(f"Speaking: {message}")
+    with lock:
+        latest_llm_response = message # Store for Web UI
+
 def get_reasoner():
     global reasoner
     if reasoner is None:
-        reasoner = SceneReasoner()
+        reasoner = SceneReasoner(on_response=on_llm_response, on_sentence=on_llm_sentence)
     return reasoner
 
 def get_audio():
@@ -71,36 +87,36 @@ def get_audio():
         audio = AudioFeedback()
     return audio
 
+LOG_FILE = "detections.jsonl" # DataLogger's default path
+
+# Used until the reasoner (and its DataLogger) exists
+startup_logs = None
+recent_logs_cache = (None, None, [])
+
+def get_log_buffer():
+    global startup_logs
+    if reasoner is not None:
+        return reasoner.llm.logger.recent
+    if startup_logs is None:
+        startup_logs = RecentLogBuffer()
+        startup_logs.seed_from_file(LOG_FILE)
+    return startup_logs
+
 def get_recent_logs(n=20):
-    """Reads the last n lines from detections.jsonl and formats them."""
-    log_file = "detections.jsonl"
-    logs = []
-    try:
-        with open(log_file, "r") as f:
-            # Efficiently read last n lines (for small files readlines is fine, 
-            # for huge files we'd use seek, but this is simple enough for now)
-            lines = f.readlines()
-            last_n = lines[-n:]
-            
-            for line in last_n:
-                try:
-                    data = json.loads(line)
-                    timestamp = data.get("timestamp", "").split("T")[-1].split(".")[0] # Extract HH:MM:SS
-                    label = data.get("label", "unknown")
-                    conf = data.get("metadata", {}).get("confidence", 0)
-                    logs.append(f"[{timestamp}] Detected {label} ({conf:.2f})")
-                except json.JSONDecodeError:
-                    continue
-    except FileNotFoundError:
-        logs.append("Log file not found.")
-    except Exception as e:
-        logs.append(f"Error reading logs: {e}")
-    # print(f"DEBUG LOGS: {len(logs)} entries found")
-    return logs
+    """Last n formatted entries of detections.jsonl, from the in-memory tail (rebuilt only when it changes)."""
+    global recent_logs_cache
+    buffer = get_log_buffer()
+    key = (id(buffer), buffer.version)
+    if recent_logs_cache[:2] != (key, n):
+        _, logs = buffer.snapshot(n)
+        if not logs and not os.path.exists(LOG_FILE):
+            logs = ["Log file not found."]
+        recent_logs_cache = (key, n, logs)
+    return recent_logs_cache[2]
 
 # Background Task for Detection
 def detection_loop():
-    global current_detections, system_status, latest_frame, latest_llm_response, current_fps
+    global current_detections, system_status, current_fps
     
     cam = get_camera()
     det = get_detector()
@@ -109,33 +125,53 @@ def detection_loop():
     
     system_status = "Running"
     frame_count = 0
+    scheduler = DetectionScheduler()
+    tracker = ObjectTracker()
     
     print("Starting Detection Loop...")
     last_loop_time = time.time()
+    last_seq = 0
+    last_boxes = None
+    detect_due = False # Scheduler asked for a detection the detector couldn't take yet
     
     while True:
         try:
-            frame = cam.read()
-            if frame is None:
-                time.sleep(0.1)
+            # Wake up as soon as a new frame is captured; never process the same frame twice
+            ref = cam.wait_for_frame(last_seq, timeout=1.0, consumer="detector")
+            if ref is None:
                 continue
-            
-            # Update latest frame for streaming
-            with lock:
-                latest_frame = frame.copy()
 
-            if frame_count % config.DETECTION_INTERVAL == 0:
+            # Read-only view of the shared frame; streaming clients read the same slot
+            with ref:
+                last_seq = ref.seq
+                frame = ref.frame
                 if det:
-                    detections = det.detect(frame)
-                    current_detections = detections
-                    
-                    # Reason and Speak
-                    message = res.process(detections, frame=frame)
-                    if message:
-                        print(f"Speaking: {message}")
-                        with lock:
-                             latest_llm_response = message # Store for Web UI
-                        aud.speak(message)
+                    # Motion is checked on every frame, even while a detection is in flight
+                    detect_due = scheduler.should_detect(frame) or detect_due
+                    if detect_due and not det.busy and det.submit(frame, ref.timestamp):
+                        detect_due = False
+
+                    result = det.poll()
+                    if result:
+                        detections, detected_at, detected_frame = result
+                        detections = tracker.update(detections, detected_at)
+                        current_detections = detections
+                        scheduler.record(detections)
+
+                        # Reason about the frame the boxes came from (not the newest one);
+                        # guidance is spoken sentence by sentence by on_llm_sentence
+                        res.process(detections, frame=detected_frame)
+                    else:
+                        # Overlay follows predicted track positions between detections
+                        current_detections = tracker.predict(frame.shape, ref.timestamp)
+
+                    # Browser overlays: boxes for this frame, only when they moved.
+                    # Sent as "boxes" events on /api/events, so a tab needs no extra connection
+                    if status_channel.subscribers:
+                        boxes = current_detections.to_boxes()
+                        if boxes != last_boxes:
+                            last_boxes = boxes
+                            status_channel.publish("boxes", frame=ref.seq, size=[frame.shape[1], frame.shape[0]], boxes=boxes)
             
             frame_count += 1
             
@@ -146,70 +182,94 @@ def detection_loop():
                 fps = 1.0 / elapsed
                 current_fps = 0.9 * current_fps + 0.1 * fps # Smoothing
             last_loop_time = current_time
-
-            time.sleep(0.01) # Small sleep to prevent tight loop
             
         except Exception as e:
             logging.error(f"Error in detection loop: {e}")
             time.sleep(1)
 
+def status_publisher():
+    """Sends dashboard changes to the status channel; idle while nobody is subscribed."""
+    log_key = None # (buffer id, version) already published
+    while True:
+        time.sleep(config.STATUS_PUSH_INTERVAL)
+        if not status_channel.subscribers:
+            continue
+        try:
+            buffer = get_log_buffer()
+            version, entries = buffer.snapshot()
+            if log_key is None:
+                new_logs = entries
+            elif log_key[0] != id(buffer):
+                new_logs = [] # Reasoner's logger took over; seeded from the same file
+            else:
+                new_logs = entries[-min(version - log_key[1], len(entries)):] if version > log_key[1] else []
+            log_key = (id(buffer), version)
+
+            status_channel.update(
+                new_logs,
+                status=system_status,
+                detections=current_detections.to_list(),
+                fps=int(current_fps),
+                llm_response=latest_llm_response
+            )
+        except Exception as e:
+            logging.error(f"Status publisher error: {e}")
+
 # Start detection in background
 @app.on_event("startup")
 async def startup_event():
     threading.Thread(target=detection_loop, daemon=True).start()
+    threading.Thread(target=status_publisher, daemon=True).start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     print("Shutting down...")
     if camera: camera.stop()
+    if detector: detector.close()
+    if reasoner: reasoner.stop()
     if audio: audio.stop()
 
 @app.get("/")
 async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
-def generate_frames():
-    global latest_frame, current_detections
-    
-    while True:
-        with lock:
-            if latest_frame is None:
-                time.sleep(0.1)
-                continue
-            
-            frame = latest_frame.copy()
-        
-        # Draw detections
-        for d in current_detections:
-            box = d['box']
-            label = f"{d['label']} {d['confidence']:.2f}"
-            color = (0, 0, 255) if d.get('is_dangerous') else (0, 255, 0)
-            cv2.rectangle(frame, (int(box[0]), int(box[1])), (int(box[2]), int(box[3])), color, 2)
-            cv2.putText(frame, label, (int(box[0]), int(box[1]) - 10), cv2.LINE_AA, 0.5, color, 2)
-            
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        
-        time.sleep(0.03) # ~30 FPS
+# Each new frame is encoded once per quality tier, whatever the number of viewers. Frames go
+# out clean; the browser draws overlays from the "boxes" events on /api/events.
+# (detection_loop owns camera start-up, so read the global rather than get_camera())
+broadcaster = MJPEGBroadcaster(lambda: camera)
 
 @app.get("/video_feed")
-async def video_feed():
-    return StreamingResponse(generate_frames(), media_type="multipart/x-mixed-replace; boundary=frame")
+async def video_feed(width: int = None, quality: int = None, fps: float = None):
+    """MJPEG stream; optional caps on width (px), JPEG quality and frame rate."""
+    return StreamingResponse(
+        broadcaster.stream(width, quality, fps),
+        media_type="multipart/x-mixed-replace; boundary=frame"
+    )
 
 @app.get("/api/status")
 async def get_status():
     return JSONResponse({
         "status": system_status,
-        "detections": current_detections,
+        "detections": current_detections.to_list(),
         "fps": int(current_fps),
         "llm_response": latest_llm_response,
         "llm_response": latest_llm_response,
         "logs": get_recent_logs()
     })
 
+@app.get("/api/events")
+async def status_events(request: Request):
+    """
+    Server-Sent Events: a snapshot, then only what changed. Resumes from Last-Event-ID.
+    Also carries "boxes" events ({seq, frame, size, boxes}) for the browser's overlays.
+    """
+    last_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    return StreamingResponse(
+        status_channel.stream(last_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 class QuestionRequest(BaseModel):
     question: str
 